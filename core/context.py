@@ -1,23 +1,27 @@
 """
-Thread-local context for current tenant.
+Context-local storage for the current tenant.
 Used by TenantAwareModel to get tenant without accessing request directly.
+
+A ContextVar is per thread under WSGI (each thread starts with an empty
+context) and also per task under ASGI, where a thread-local would leak
+between coroutines sharing the event loop thread.
 """
-import threading
+from contextvars import ContextVar
 
-_thread_locals = threading.local()
+_current_tenant = ContextVar("current_tenant", default=None)
 
 
 def get_current_tenant():
-    """Return the tenant for the current request thread, or None."""
-    return getattr(_thread_locals, "tenant", None)
+    """Return the tenant for the current request context, or None."""
+    return _current_tenant.get()
 
 
 def set_current_tenant(tenant):
-    """Set the tenant for the current request thread."""
-    _thread_locals.tenant = tenant
+    """Set the tenant for the current request context."""
+    _current_tenant.set(tenant)
 
 
 def clear_current_tenant():
-    """Clear the tenant from the current request thread."""
-    if hasattr(_thread_locals, "tenant"):
-        del _thread_locals.tenant
+    """Clear the tenant from the current request context."""
+    _current_tenant.set(None)
+
@@ -1,12 +1,38 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.http import JsonResponse
 
 from .context import clear_current_tenant, set_current_tenant
-from .models import Tenant
+from .models import Tenant, tenant_cache_key
+
+# Short TTL: bounds how long another process can serve a deactivated tenant
+TENANT_CACHE_TIMEOUT = 60
+
+
+def resolve_tenant(subdomain):
+    """
+    Return the active Tenant for a subdomain, cached for TENANT_CACHE_TIMEOUT seconds.
+    Raises Tenant.DoesNotExist for unknown/inactive subdomains (misses are not cached).
+    """
+    key = tenant_cache_key(subdomain)
+    tenant = cache.get(key)
+    if tenant is None:
+        tenant = Tenant.objects.get(subdomain=subdomain, is_active=True)
+        cache.set(key, tenant, TENANT_CACHE_TIMEOUT)
+    return tenant
+
+
+@receiver([post_save, post_delete], sender=Tenant)
+def clear_tenant_cache(sender, instance, **kwargs):
+    """Drop the cached lookup when a tenant changes (e.g. is deactivated)."""
+    # Bulk writes send no signal: TenantQuerySet clears the keys for those
+    cache.delete(tenant_cache_key(instance.subdomain))
 
 
 class TenantMiddleware:
     """
-    Resolves tenant from subdomain and sets it in thread-local context.
+    Resolves tenant from subdomain and sets it in the request's tenant context.
     Returns 404 with standard error format if tenant not found.
     """
 
@@ -24,11 +50,9 @@ class TenantMiddleware:
         else:
             subdomain = host.split(".")[0]
 
-        tenant = Tenant.objects.filter(
-            subdomain=subdomain, is_active=True
-        ).first()
-
-        if tenant is None:
+        try:
+            tenant = resolve_tenant(subdomain)
+        except Tenant.DoesNotExist:
             return JsonResponse(
                 {"error": {"code": "TENANT_NOT_FOUND", "message": "Tenant não encontrado"}},
                 status=404,
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-16 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_add_refund_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='payment_link',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_payment_id_external_partial_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pendente'), ('APPROVED', 'Aprovado'), ('REJECTED', 'Rejeitado'), ('FAILED', 'Falhou')], default='PENDING', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='error_message',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
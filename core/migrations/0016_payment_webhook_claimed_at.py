@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-16 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_payment_failed_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='webhook_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from datetime import timedelta
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.core.cache import cache
 from django.utils import timezone
 from django.contrib.postgres.constraints import ExclusionConstraint
 from django.contrib.postgres.fields import DateTimeRangeField, RangeBoundary, RangeOperators
@@ -73,7 +74,7 @@ class TenantAwareManager(models.Manager):
 class TenantAwareModel(models.Model):
     """
     Abstract base for models that belong to a tenant.
-    Auto-sets tenant from thread-local context on save.
+    Auto-sets tenant from the current tenant context on save.
     Use TenantAwareManager for automatic tenant filtering.
     """
 
@@ -95,12 +96,41 @@ class TenantAwareModel(models.Model):
         super().save(*args, **kwargs)
 
 
+def tenant_cache_key(subdomain):
+    return f"tenant:{subdomain}"
+
+
+class TenantQuerySet(models.QuerySet):
+    """
+    Drops the cached subdomain lookups (core.middleware.resolve_tenant) on bulk
+    writes, which bypass the post_save/post_delete receivers.
+    bulk_update() goes through update(), so it is covered too.
+    """
+
+    def _clear_cached(self, subdomains):
+        cache.delete_many([tenant_cache_key(subdomain) for subdomain in subdomains])
+
+    def update(self, **kwargs):
+        subdomains = list(self.values_list("subdomain", flat=True))
+        rows = super().update(**kwargs)
+        self._clear_cached(subdomains)
+        return rows
+
+    def delete(self):
+        subdomains = list(self.values_list("subdomain", flat=True))
+        result = super().delete()
+        self._clear_cached(subdomains)
+        return result
+
+
 class Tenant(models.Model):
     name = models.CharField(max_length=100)
     subdomain = models.CharField(max_length=63, unique=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TenantQuerySet.as_manager()
+
     def __str__(self):
         return self.subdomain
 
@@ -209,6 +239,7 @@ class Payment(TenantAwareModel):
         ("PENDING", "Pendente"),
         ("APPROVED", "Aprovado"),
         ("REJECTED", "Rejeitado"),
+        ("FAILED", "Falhou"),
     ]
 
     appointment = models.OneToOneField(
@@ -216,12 +247,25 @@ class Payment(TenantAwareModel):
     )
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
-    payment_id_external = models.CharField(
-        max_length=100, unique=True, null=True, blank=True
-    )
+    payment_id_external = models.CharField(max_length=100, null=True, blank=True)
+    payment_link = models.URLField(max_length=500, blank=True)
     webhook_processed = models.BooleanField(default=False)
+    # Set while a webhook task queries MP for this payment (dedups concurrent retries)
+    webhook_claimed_at = models.DateTimeField(null=True, blank=True)
+    # Why the MP preference could not be created (status FAILED)
+    error_message = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Webhook lookup key. Partial: payments awaiting their MP preference have NULL
+            models.UniqueConstraint(
+                fields=["payment_id_external"],
+                condition=Q(payment_id_external__isnull=False),
+                name="uniq_payment_id_external",
+            ),
+        ]
+
     def __str__(self):
         return f"Payment {self.id} - {self.appointment} - {self.status}"
 
@@ -0,0 +1,58 @@
+"""
+Shared Mercado Pago SDK client.
+
+The SDK is built once per process (lazily, on first use) and backed by a
+single pooled requests.Session, so checkout and webhook calls reuse
+keep-alive TCP/TLS connections instead of opening a new one per request.
+"""
+from functools import lru_cache
+
+import mercadopago
+import requests
+from django.conf import settings
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Same retry policy the SDK's default HttpClient applies per call
+MP_MAX_RETRIES = 3
+MP_RETRY_STATUS = [429, 500, 502, 503, 504]
+
+
+class PooledHttpClient(HttpClient):
+    """HttpClient that sends every call through one shared, pooled Session."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def request(self, method, url, maxretries=None, retry_on=None, backoff_factor=None, **kwargs):
+        # Retry settings (maxretries; retry_on/backoff_factor on SDK 3.x) are
+        # consumed here: the session's mounted adapter already retries, and
+        # requests.Session.request() rejects unknown keyword arguments.
+        api_result = self.session.request(method, url, **kwargs)
+        return {
+            "status": api_result.status_code,
+            # 204 / empty body: no JSON to parse (SDK 3.x returns None too)
+            "response": api_result.json() if api_result.content else None,
+        }
+
+
+def build_session():
+    """Create a requests.Session with a connection pool mounted for HTTPS."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=50,
+        max_retries=Retry(total=MP_MAX_RETRIES, status_forcelist=MP_RETRY_STATUS),
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+@lru_cache(maxsize=1)
+def get_mp_sdk():
+    """Return the process-wide Mercado Pago SDK instance."""
+    return mercadopago.SDK(
+        settings.MERCADOPAGO_ACCESS_TOKEN,
+        http_client=PooledHttpClient(build_session()),
+    )
@@ -1,6 +1,6 @@
-from datetime import timedelta
+from functools import lru_cache
 
-from django.db import models
+from django.db import IntegrityError, transaction
 from pycpfcnpj import cpfcnpj
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -9,6 +9,12 @@ from .exceptions import AppointmentConflictError
 from .models import Appointment, Customer, Payment, Pet, Service, Tenant
 from .services import AppointmentService
 
+# Check-digit validation is pure; the same CPFs come back on retries and edits
+_cpf_is_valid = lru_cache(maxsize=256)(cpfcnpj.validate)
+
+# Formatting characters accepted in CPF input (390.533.447-05)
+_CPF_PUNCTUATION = str.maketrans("", "", ".-/ \t")
+
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom JWT serializer that includes tenant_id in the token payload."""
@@ -35,14 +41,18 @@ class TenantSerializer(serializers.ModelSerializer):
 class CustomerSerializer(serializers.ModelSerializer):
     """Serializer for Customer CRUD with CPF validation."""
 
+    # Accepts the formatted "000.000.000-00" form: validate_cpf normalizes it
+    # to the 11 digits the model column holds
+    cpf = serializers.CharField(max_length=14)
+
     class Meta:
         model = Customer
         fields = ["id", "name", "cpf", "email", "phone", "created_at"]
         read_only_fields = ["id", "created_at"]
 
     def validate_cpf(self, value):
-        digits = "".join(filter(str.isdigit, value or ""))
-        if len(digits) != 11 or not cpfcnpj.validate(digits):
+        digits = (value or "").translate(_CPF_PUNCTUATION)
+        if len(digits) != 11 or not (digits.isascii() and digits.isdigit()) or not _cpf_is_valid(digits):
             raise serializers.ValidationError("CPF inválido.")
         return digits
 
@@ -159,39 +169,27 @@ class PreBookAppointmentSerializer(serializers.Serializer):
             raise serializers.ValidationError("Serviço pertence a outro tenant")
         return value
 
-    def validate(self, attrs):
-        attrs = super().validate(attrs)
-        request = self.context.get("request")
-        if not request or not hasattr(request, "tenant"):
-            return attrs
-        pet_id = attrs["pet_id"]
-        service_id = attrs["service_id"]
-        scheduled_at = attrs["scheduled_at"]
-        service = Service.objects.get(pk=service_id)
-        end_time = scheduled_at + timedelta(minutes=service.duration_minutes)
-        overlapping = Appointment.objects.filter(
-            models.Q(pet_id=pet_id) | models.Q(service_id=service_id)
-        ).exclude(status__in=["CANCELLED", "EXPIRED"]).filter(
-            scheduled_at__lt=end_time,
-            end_time__gt=scheduled_at,
-        )
-        if overlapping.exists():
-            raise AppointmentConflictError("Horário já ocupado")
-        return attrs
-
     def create(self, validated_data):
         request = self.context["request"]
         tenant = request.tenant
         pet = Pet.objects.get(pk=validated_data["pet_id"])
         service = Service.objects.get(pk=validated_data["service_id"])
         scheduled_at = validated_data["scheduled_at"]
-        return Appointment.objects.create(
-            tenant=tenant,
-            pet=pet,
-            service=service,
-            scheduled_at=scheduled_at,
-            status="PRE_BOOKED",
-        )
+        # Overlaps are rejected by the no_overlap exclusion constraint on INSERT
+        # (no SELECT beforehand, so no check-then-insert race)
+        try:
+            with transaction.atomic():
+                return Appointment.objects.create(
+                    tenant=tenant,
+                    pet=pet,
+                    service=service,
+                    scheduled_at=scheduled_at,
+                    status="PRE_BOOKED",
+                )
+        except IntegrityError as exc:
+            if "no_overlap" in str(exc):
+                raise AppointmentConflictError("Horário já ocupado") from exc
+            raise
 
 
 class CheckoutSerializer(serializers.Serializer):
@@ -215,6 +213,15 @@ class CheckoutSerializer(serializers.Serializer):
         return value
 
 
+class PaymentSerializer(serializers.ModelSerializer):
+    """Read-only Payment representation for GET /payments/{id}/ (checkout polling)."""
+
+    class Meta:
+        model = Payment
+        fields = ["id", "appointment", "amount", "status", "payment_link", "error_message", "created_at"]
+        read_only_fields = fields
+
+
 class CancelAppointmentSerializer(serializers.Serializer):
     """Request body for POST /appointments/{id}/cancel/. Optional reason."""
 
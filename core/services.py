@@ -4,12 +4,20 @@ Service Layer for business logic.
 This module contains service classes that encapsulate business logic
 and orchestrate operations across models.
 """
+import logging
+from datetime import timedelta
 from decimal import Decimal
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
-from .exceptions import InvalidTransitionError
-from .models import Payment
+from .exceptions import InvalidTransitionError, PaymentFailedError
+from .models import Appointment, Payment, Refund
+from .mp_client import get_mp_sdk
+
+logger = logging.getLogger(__name__)
 
 
 class AppointmentService:
@@ -30,7 +38,9 @@ class AppointmentService:
         """
         Transition an appointment to a new status.
 
-        Validates that the transition is allowed according to ALLOWED_TRANSITIONS.
+        Validates that the transition is allowed according to ALLOWED_TRANSITIONS,
+        then writes it with a single UPDATE conditioned on the status the
+        instance was read with (no save(): no Service lookup, no full-row write).
         
         Args:
             appointment: Appointment instance
@@ -40,7 +50,9 @@ class AppointmentService:
             Appointment: Updated appointment instance
         
         Raises:
-            InvalidTransitionError: If transition is not allowed
+            InvalidTransitionError: If transition is not allowed, including when
+                another request changed the status in the meantime
+            Appointment.DoesNotExist: If the row was deleted in the meantime
         """
         current_status = appointment.status
         allowed = cls.ALLOWED_TRANSITIONS.get(current_status, [])
@@ -48,8 +60,25 @@ class AppointmentService:
         if new_status not in allowed:
             raise InvalidTransitionError(current_status, new_status, allowed)
 
+        # update() skips auto_now: set updated_at explicitly
+        now = timezone.now()
+        updated = Appointment.all_objects.filter(
+            pk=appointment.pk, status=current_status
+        ).update(status=new_status, updated_at=now)
+        if not updated:
+            current_status = (
+                Appointment.all_objects.filter(pk=appointment.pk)
+                .values_list("status", flat=True)
+                .first()
+            )
+            if current_status is None:
+                raise Appointment.DoesNotExist(f"Appointment {appointment.pk} no longer exists")
+            raise InvalidTransitionError(
+                current_status, new_status, cls.ALLOWED_TRANSITIONS.get(current_status, [])
+            )
+
         appointment.status = new_status
-        appointment.save()
+        appointment.updated_at = now
         return appointment
 
     @classmethod
@@ -129,3 +158,243 @@ class CancellationService:
 
         refund_amount = (paid_amount * refund_percent).quantize(Decimal("0.01"))
         return refund_amount
+
+    @classmethod
+    def cancel(cls, appointment, reason=""):
+        """
+        Cancel an appointment and record its refund.
+
+        Args:
+            appointment: Appointment instance (CONFIRMED)
+            reason: Cancellation reason (truncated to 255 chars)
+
+        Returns:
+            Refund: PENDING refund with the amount from calculate_refund
+
+        Raises:
+            InvalidTransitionError: If the appointment cannot be cancelled
+            Appointment.DoesNotExist: If the row was deleted in the meantime
+        """
+        refund_amount = cls.calculate_refund(appointment)
+
+        AppointmentService.transition(appointment, "CANCELLED")
+
+        return Refund.objects.create(
+            appointment=appointment,
+            amount=refund_amount,
+            status="PENDING",
+            reason=reason[:255],
+            tenant_id=appointment.tenant_id,
+        )
+
+
+class PaymentService:
+    """Service for Mercado Pago calls. Runs in Celery tasks, off the request path."""
+
+    # Well above an MP round trip (incl. the session's own HTTP retries)
+    WEBHOOK_CLAIM_TTL = timedelta(minutes=2)
+
+    @classmethod
+    def create_preference(cls, payment_id):
+        """
+        Create the Mercado Pago preference for a checkout Payment.
+
+        Saves payment_id_external and payment_link on success. Errors propagate
+        so the Celery task can retry; once it gives up it calls mark_preference_failed.
+
+        Args:
+            payment_id: Payment primary key (int)
+
+        Returns:
+            Payment: Updated payment
+
+        Raises:
+            PaymentFailedError: If MP does not return a preference
+        """
+        payment = Payment.all_objects.select_related(
+            "appointment__service", "appointment__pet"
+        ).get(pk=payment_id)
+        appointment = payment.appointment
+        # The SDK json.dumps() the payload and MP expects a JSON number, so Decimal
+        # can't go through as-is. amount comes back from the DB quantized to 2
+        # places, so float repr round-trips it exactly; convert once.
+        unit_price = float(payment.amount)
+
+        logger.info(
+            "Creating MP preference",
+            extra={
+                "appointment_id": appointment.id,
+                "amount": unit_price,
+                "token_prefix": settings.MERCADOPAGO_ACCESS_TOKEN[:20],
+            },
+        )
+
+        sdk = get_mp_sdk()
+        preference_data = {
+            "items": [
+                {
+                    "title": f"{appointment.service.name} - {appointment.pet.name}",
+                    "quantity": 1,
+                    "unit_price": unit_price,
+                }
+            ]
+        }
+
+        # Full payloads only at DEBUG: skips dict repr on the hot path
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Calling MP API", extra={"preference_data": preference_data})
+        preference_response = sdk.preference().create(preference_data)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MP Response", extra={"response": preference_response})
+
+        preference = preference_response.get("response") or {}
+
+        if preference_response.get("status") not in (200, 201) or "id" not in preference:
+            error_msg = preference.get("message") or "Failed to create Mercado Pago preference"
+            logger.error(
+                "MP preference creation failed",
+                extra={"payment_id": payment.id, "response": preference_response},
+            )
+            raise PaymentFailedError(error_msg)
+
+        payment.payment_id_external = preference["id"]
+        payment.payment_link = preference.get("init_point") or ""
+        # Only the two MP columns changed: narrow UPDATE, not a full-row rewrite
+        payment.save(update_fields=["payment_id_external", "payment_link"])
+        logger.info(
+            "MP preference created",
+            extra={
+                "payment_id": payment.id,
+                "preference_id": preference["id"],
+                "item_count": len(preference_data["items"]),
+            },
+        )
+        return payment
+
+    @classmethod
+    def mark_preference_failed(cls, payment_id, error_message):
+        """
+        Flag a checkout Payment whose MP preference could not be created.
+
+        The row is kept (status FAILED + error_message) so GET /payments/{id}/
+        tells the polling client why; a new checkout for the appointment reuses it.
+        """
+        Payment.all_objects.filter(pk=payment_id, status="PENDING").update(
+            status="FAILED", error_message=error_message[:255]
+        )
+
+    @classmethod
+    def process_notification(cls, payment_id, payment_id_external):
+        """
+        Query Mercado Pago for a payment and apply the final status.
+
+        approved: Payment -> APPROVED, Appointment -> CONFIRMED
+        rejected: Payment -> REJECTED (Appointment stays PRE_BOOKED)
+        Anything else is left untouched for a later notification.
+
+        Errors propagate so the Celery task can retry: MP already got its 200
+        for the notification and will not resend it.
+
+        Args:
+            payment_id: Payment primary key (int)
+            payment_id_external: Mercado Pago payment id (str)
+
+        Returns:
+            str: "processed", "already_processed" or "pending"
+
+        Raises:
+            PaymentFailedError: If MP answers with an error status or an empty body
+        """
+        # Claim the row before the MP round trip (conditional UPDATE, no lock
+        # held across the HTTP call): a concurrent retry or an already processed
+        # payment matches no row and never queries MP. A claim older than
+        # WEBHOOK_CLAIM_TTL belongs to a worker that died mid-call.
+        claimed_at = timezone.now()
+        claimed = Payment.all_objects.filter(
+            Q(webhook_claimed_at__isnull=True)
+            | Q(webhook_claimed_at__lt=claimed_at - cls.WEBHOOK_CLAIM_TTL),
+            pk=payment_id,
+            webhook_processed=False,
+        ).update(webhook_claimed_at=claimed_at)
+        if not claimed:
+            logger.info(
+                "Payment already processed or claimed by another worker",
+                extra={"payment_id": payment_id},
+            )
+            return "already_processed"
+
+        try:
+            return cls._apply_mp_status(payment_id, payment_id_external)
+        finally:
+            # Release for the next notification / task retry (no-op if the claim expired)
+            Payment.all_objects.filter(pk=payment_id, webhook_claimed_at=claimed_at).update(
+                webhook_claimed_at=None
+            )
+
+    @classmethod
+    def _apply_mp_status(cls, payment_id, payment_id_external):
+        """Query MP for the claimed payment and apply a final status."""
+        sdk = get_mp_sdk()
+        payment_info = sdk.payment().get(payment_id_external)
+        payment_response = payment_info.get("response") or {}
+
+        if payment_info.get("status") != 200 or not payment_response:
+            logger.error(
+                "Error querying Mercado Pago API",
+                extra={
+                    "payment_id": payment_id,
+                    "mp_http_status": payment_info.get("status"),
+                    "response": payment_response,
+                },
+            )
+            raise PaymentFailedError("Mercado Pago payment query failed")
+
+        mp_status = payment_response.get("status")
+        logger.info(
+            "Payment status from MP",
+            extra={
+                "payment_id": payment_id,
+                "payment_id_external": payment_id_external,
+                "mp_status": mp_status,
+            },
+        )
+
+        if mp_status == "approved":
+            new_status = "APPROVED"
+        elif mp_status == "rejected":
+            new_status = "REJECTED"
+        else:
+            logger.info(
+                "Payment status not final",
+                extra={"payment_id": payment_id, "mp_status": mp_status},
+            )
+            return "pending"
+
+        with transaction.atomic():
+            updated = Payment.all_objects.filter(
+                pk=payment_id, webhook_processed=False
+            ).update(status=new_status, webhook_processed=True)
+            if not updated:
+                logger.info(
+                    "Payment already processed by another worker",
+                    extra={"payment_id": payment_id},
+                )
+                return "already_processed"
+
+            if new_status == "APPROVED":
+                # update() skips auto_now: set updated_at explicitly
+                Appointment.all_objects.filter(payment__pk=payment_id).update(
+                    status="CONFIRMED", updated_at=timezone.now()
+                )
+
+        if new_status == "APPROVED":
+            logger.info(
+                "Payment approved and appointment confirmed",
+                extra={"payment_id": payment_id},
+            )
+        else:
+            logger.info(
+                "Payment rejected",
+                extra={"payment_id": payment_id, "mp_status": mp_status},
+            )
+        return "processed"
@@ -0,0 +1,38 @@
+"""
+Celery tasks for Mercado Pago integration.
+
+Keep tasks thin: they receive primary keys (never model instances) and
+delegate to PaymentService.
+"""
+from celery import shared_task
+
+from .services import PaymentService
+
+
+# Retried with exponential backoff (~1s, 2s, 4s, ...): once the view has sent
+# its 200, MP will not resend the notification, so a transient MP or database
+# error has to be retried here instead of being dropped.
+MP_TASK_MAX_RETRIES = 5
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=MP_TASK_MAX_RETRIES)
+def process_mp_webhook(payment_id, payment_id_external):
+    """Fetch the payment status from MP and apply it. Returns the outcome string."""
+    return PaymentService.process_notification(payment_id, payment_id_external)
+
+
+@shared_task(bind=True, max_retries=MP_TASK_MAX_RETRIES)
+def create_mp_preference(self, payment_id):
+    """
+    Create the MP preference for a checkout Payment (sets payment_link).
+
+    Retried with the same backoff as process_mp_webhook; when the retries run
+    out the Payment is marked FAILED with the error for GET /payments/{id}/.
+    """
+    try:
+        PaymentService.create_preference(payment_id)
+    except Exception as exc:
+        if self.request.retries >= self.max_retries:
+            PaymentService.mark_preference_failed(payment_id, str(exc))
+            raise
+        raise self.retry(exc=exc, countdown=2 ** self.request.retries)
@@ -6,7 +6,7 @@ from unittest.mock import MagicMock, patch
 import jwt
 from django.conf import settings
 from django.db import models
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from rest_framework.test import APIClient, APIRequestFactory
 
 from .context import clear_current_tenant, get_current_tenant, set_current_tenant
@@ -15,6 +15,19 @@ from .permissions import IsOwner, IsOwnerOrAttendant
 from .services import AppointmentService, CancellationService, InvalidTransitionError
 
 
+class EagerCeleryMixin:
+    """Run Celery tasks inline so checkout/webhook side effects are visible in the tests."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Celery reads CELERY_* from Django settings, so assigning celery_app.conf
+        # would be shadowed; override the setting and undo it once the class is done
+        eager = override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+        eager.enable()
+        cls.addClassCleanup(eager.disable)
+
+
 class TenantMiddlewareIntegrationTests(TestCase):
     """Integration tests for TenantMiddleware - DoD: subdomain isolation + error format."""
 
@@ -1013,7 +1026,7 @@ class PaymentModelTests(TestCase):
         self.assertEqual(Payment.all_objects.count(), 1)
 
 
-class CheckoutAPITests(TestCase):
+class CheckoutAPITests(EagerCeleryMixin, TestCase):
     """DoD: checkout returns payment_link, creates Payment with 50% amount, validates PRE_BOOKED."""
 
     def setUp(self):
@@ -1045,11 +1058,12 @@ class CheckoutAPITests(TestCase):
             status="PRE_BOOKED",
         )
 
-    @patch("mercadopago.SDK")
+    @patch("core.services.get_mp_sdk")
     def test_checkout_creates_payment_and_returns_link(self, mock_sdk):
-        """Checkout creates Payment with 50% amount and returns payment_link from MP."""
+        """Checkout creates Payment with 50% amount; the task stores payment_link from MP."""
         mock_preference = MagicMock()
         mock_preference.create.return_value = {
+            "status": 201,
             "response": {
                 "id": "mp-pref-123",
                 "init_point": "https://www.mercadopago.com.br/checkout/v1/redirect?pref_id=mp-pref-123",
@@ -1064,15 +1078,18 @@ class CheckoutAPITests(TestCase):
             format="json",
             HTTP_HOST="chk1.localhost:8000",
         )
-        self.assertEqual(response.status_code, 201)
-        self.assertIn("payment_link", response.data)
-        self.assertIn("mp-pref-123", response.data["payment_link"])
+        self.assertEqual(response.status_code, 202)
 
         payment = Payment.all_objects.get(appointment=self.appointment)
+        self.assertEqual(response.data["payment_id"], payment.id)
         self.assertEqual(payment.amount, Decimal("50.00"))
         self.assertEqual(payment.status, "PENDING")
         self.assertEqual(payment.payment_id_external, "mp-pref-123")
 
+        detail = self.client.get(f"/api/payments/{payment.id}/", HTTP_HOST="chk1.localhost:8000")
+        self.assertEqual(detail.status_code, 200)
+        self.assertIn("mp-pref-123", detail.data["payment_link"])
+
     def test_checkout_appointment_not_prebooked_returns_400(self):
         """Checkout with appointment not PRE_BOOKED returns 400."""
         self.appointment.status = "CONFIRMED"
@@ -1088,7 +1105,7 @@ class CheckoutAPITests(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("PRE_BOOKED", response.data["error"]["message"])
 
-    @patch("mercadopago.SDK")
+    @patch("core.services.get_mp_sdk")
     def test_checkout_wrong_tenant_returns_400(self, mock_sdk):
         """Checkout with appointment from another tenant returns 400."""
         tenant2 = Tenant.objects.create(subdomain="chk2", name="Tenant 2")
@@ -1106,7 +1123,7 @@ class CheckoutAPITests(TestCase):
         self.assertIn("outro tenant", response.data["error"]["message"].lower())
 
 
-class MercadoPagoWebhookTests(TestCase):
+class MercadoPagoWebhookTests(EagerCeleryMixin, TestCase):
     """DoD: webhook processes payment notification, updates Payment and Appointment status."""
 
     def setUp(self):
@@ -1144,11 +1161,12 @@ class MercadoPagoWebhookTests(TestCase):
             payment_id_external="mp-12345",
         )
 
-    @patch("mercadopago.SDK")
+    @patch("core.services.get_mp_sdk")
     def test_webhook_approved_payment_confirms_appointment(self, mock_sdk):
         """Webhook with approved payment updates Payment to APPROVED and Appointment to CONFIRMED."""
         mock_payment = MagicMock()
         mock_payment.get.return_value = {
+            "status": 200,
             "response": {
                 "id": "mp-12345",
                 "status": "approved",
@@ -1168,8 +1186,7 @@ class MercadoPagoWebhookTests(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data["status"], "processed")
-        self.assertEqual(response.data["payment_status"], "approved")
+        self.assertEqual(response.json()["status"], "queued")
 
         # Refresh from database
         self.payment.refresh_from_db()
@@ -1179,11 +1196,12 @@ class MercadoPagoWebhookTests(TestCase):
         self.assertTrue(self.payment.webhook_processed)
         self.assertEqual(self.appointment.status, "CONFIRMED")
 
-    @patch("mercadopago.SDK")
+    @patch("core.services.get_mp_sdk")
     def test_webhook_rejected_payment_updates_status(self, mock_sdk):
         """Webhook with rejected payment updates Payment to REJECTED."""
         mock_payment = MagicMock()
         mock_payment.get.return_value = {
+            "status": 200,
             "response": {
                 "id": "mp-12345",
                 "status": "rejected",
@@ -1203,13 +1221,13 @@ class MercadoPagoWebhookTests(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data["payment_status"], "rejected")
+        self.assertEqual(response.json()["status"], "queued")
 
         self.payment.refresh_from_db()
         self.assertEqual(self.payment.status, "REJECTED")
         self.assertTrue(self.payment.webhook_processed)
 
-    @patch("mercadopago.SDK")
+    @patch("core.services.get_mp_sdk")
     def test_webhook_already_processed_returns_200(self, mock_sdk):
         """Webhook for already processed payment returns 200 without reprocessing."""
         self.payment.webhook_processed = True
@@ -1227,7 +1245,7 @@ class MercadoPagoWebhookTests(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data["status"], "already_processed")
+        self.assertEqual(response.json()["status"], "already_processed")
 
         # Verify SDK was not called
         mock_sdk.assert_not_called()
@@ -1262,10 +1280,10 @@ class MercadoPagoWebhookTests(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data["status"], "ignored")
+        self.assertEqual(response.json()["status"], "ignored")
 
 
-class WebhookIdempotencyTests(TestCase):
+class WebhookIdempotencyTests(EagerCeleryMixin, TestCase):
     """DoD: Reenviar mesmo webhook 5x = apenas 1 processamento."""
 
     def setUp(self):
@@ -1303,11 +1321,12 @@ class WebhookIdempotencyTests(TestCase):
             payment_id_external="mp-idempotent-123",
         )
 
-    @patch("mercadopago.SDK")
+    @patch("core.services.get_mp_sdk")
     def test_webhook_idempotency_five_calls_one_processing(self, mock_sdk):
         """Sending the same webhook 5 times should only process once."""
         mock_payment = MagicMock()
         mock_payment.get.return_value = {
+            "status": 200,
             "response": {
                 "id": "mp-idempotent-123",
                 "status": "approved",
@@ -1331,12 +1350,11 @@ class WebhookIdempotencyTests(TestCase):
             self.assertEqual(response.status_code, 200, f"Call {i+1} failed")
             
             if i == 0:
-                # First call should process
-                self.assertEqual(response.data["status"], "processed")
-                self.assertEqual(response.data["payment_status"], "approved")
+                # First call should be queued (processed inline by the eager worker)
+                self.assertEqual(response.json()["status"], "queued")
             else:
                 # Subsequent calls should be ignored (idempotency)
-                self.assertEqual(response.data["status"], "already_processed")
+                self.assertEqual(response.json()["status"], "already_processed")
 
         # Verify payment was only updated once
         self.payment.refresh_from_db()
@@ -13,6 +13,7 @@ urlpatterns = [
     path("health/", views.health),
     path("appointments/pre-book/", views.PreBookAppointmentView.as_view(), name="pre_book_appointment"),
     path("payments/checkout/", views.CheckoutView.as_view(), name="checkout"),
+    path("payments/<int:pk>/", views.PaymentDetailView.as_view(), name="payment_detail"),
     path("webhooks/mercadopago/", views.MercadoPagoWebhookView.as_view(), name="mercadopago_webhook"),
     path("tenant-info/", views.tenant_info),
     path("auth/login/", views.LoginView.as_view(), name="token_obtain_pair"),
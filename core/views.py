@@ -1,24 +1,19 @@
-import hashlib
-import hmac
 import logging
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db import transaction
 from rest_framework import generics, permissions, viewsets
 from drf_spectacular.utils import extend_schema
 
 from .schema import ERROR_RESPONSES
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from rest_framework.response import Response
 
-from decimal import Decimal
-
-from django.conf import settings
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -29,14 +24,16 @@ from .serializers import (
     CheckoutSerializer,
     CustomTokenObtainPairSerializer,
     CustomerSerializer,
+    PaymentSerializer,
     PetSerializer,
     PreBookAppointmentSerializer,
     ServiceSerializer,
     TenantSerializer,
 )
-from .models import Appointment, Customer, Payment, Pet, Refund, Service
+from .models import Appointment, Customer, Payment, Pet, Service
 from .permissions import IsOwnerOrAttendant
-from .services import AppointmentService, CancellationService
+from .services import CancellationService
+from .tasks import create_mp_preference, process_mp_webhook
 
 
 def health(request):
@@ -131,6 +128,13 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Appointment.objects.all()
 
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except Appointment.DoesNotExist:
+            # Deleted between get_object() and the transition's UPDATE
+            raise NotFound("Appointment não encontrado")
+
     @extend_schema(
         request=CancelAppointmentSerializer,
         responses={
@@ -154,19 +158,13 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             )
 
         reason = request.data.get("reason", "") or ""
-        refund_amount = CancellationService.calculate_refund(appointment)
-
-        AppointmentService.transition(appointment, "CANCELLED")
-
-        Refund.objects.create(
-            appointment=appointment,
-            amount=refund_amount,
-            status="PENDING",
-            reason=reason[:255],
-            tenant=appointment.tenant,
-        )
+        try:
+            refund = CancellationService.cancel(appointment, reason=reason)
+        except Appointment.DoesNotExist:
+            # Deleted between get_object() and the transition's UPDATE
+            raise NotFound("Appointment não encontrado")
 
-        return Response({"refund_amount": str(refund_amount)}, status=200)
+        return Response({"refund_amount": str(refund.amount)}, status=200)
 
 
 @extend_schema(responses={201: {"description": "appointment created"}, **ERROR_RESPONSES})
@@ -191,9 +189,9 @@ class PreBookAppointmentView(generics.CreateAPIView):
         )
 
 
-@extend_schema(responses={201: {"description": "payment_link"}, **ERROR_RESPONSES})
+@extend_schema(responses={202: {"description": "payment_id"}, **ERROR_RESPONSES})
 class CheckoutView(generics.CreateAPIView):
-    """POST /payments/checkout - creates payment and returns Mercado Pago link."""
+    """POST /payments/checkout - creates payment and enqueues Mercado Pago preference creation."""
 
     serializer_class = CheckoutSerializer
     permission_classes = [IsOwnerOrAttendant]
@@ -205,70 +203,50 @@ class CheckoutView(generics.CreateAPIView):
         appointment_id = serializer.validated_data["appointment_id"]
         appointment = Appointment.objects.get(pk=appointment_id)
         
-        # Calculate 50% of service price
-        amount = Decimal(str(appointment.service.price)) * Decimal("0.5")
-        
-        # Create Payment record
-        payment = Payment.objects.create(
-            appointment=appointment,
-            amount=amount,
-            status="PENDING",
-        )
+        # Calculate 50% of service price (price is already a Decimal from the DB)
+        amount = appointment.service.price / 2
         
-        # Create Mercado Pago preference
-        try:
-            import mercadopago
-            
-            logger.info(
-                "Creating MP preference",
-                extra={
-                    "appointment_id": appointment.id,
-                    "amount": float(amount),
-                    "token_prefix": settings.MERCADOPAGO_ACCESS_TOKEN[:20],
-                },
-            )
-            
-            sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
-            preference_data = {
-                "items": [
-                    {
-                        "title": f"{appointment.service.name} - {appointment.pet.name}",
-                        "quantity": 1,
-                        "unit_price": float(amount),
-                    }
-                ]
-            }
-            
-            logger.info("Calling MP API", extra={"preference_data": preference_data})
-            preference_response = sdk.preference().create(preference_data)
-            logger.info("MP Response", extra={"response": preference_response})
-            
-            preference = preference_response.get("response", {})
-            
-            if not preference or "id" not in preference:
-                error_msg = preference_response.get("message", "Failed to create Mercado Pago preference")
-                logger.error("MP preference creation failed", extra={"response": preference_response})
-                raise Exception(error_msg)
-            
-            # Save external payment ID
-            payment.payment_id_external = preference["id"]
-            payment.save()
-            
-            return Response(
-                {"payment_link": preference.get("init_point")},
-                status=201,
-            )
-        except Exception as e:
-            logger.error(
-                "Checkout error",
-                extra={"error": str(e), "error_type": type(e).__name__},
-                exc_info=True,
-            )
-            payment.delete()
-            return Response(
-                {"error": {"code": "PAYMENT_ERROR", "message": str(e)}},
-                status=500,
+        # A checkout whose preference failed keeps its FAILED row (the client polled
+        # its error); the appointment has a single Payment, so retry on that row
+        payment = Payment.objects.filter(appointment=appointment, status="FAILED").first()
+        if payment is not None:
+            payment.amount = amount
+            payment.status = "PENDING"
+            payment.error_message = ""
+            payment.save(update_fields=["amount", "status", "error_message"])
+        else:
+            payment = Payment.objects.create(
+                appointment=appointment,
+                amount=amount,
+                status="PENDING",
             )
+        
+        # MP round trip runs in the worker; client polls GET /payments/{id} for the link
+        create_mp_preference.delay(payment.id)
+
+        return Response({"payment_id": payment.id}, status=202)
+
+
+@extend_schema(responses={**ERROR_RESPONSES})
+class PaymentDetailView(generics.RetrieveAPIView):
+    """GET /payments/{id} - payment status and Mercado Pago link (empty until the preference is created)."""
+
+    serializer_class = PaymentSerializer
+    permission_classes = [IsOwnerOrAttendant]
+
+    def get_queryset(self):
+        return Payment.objects.all()
+
+
+# Precomputed webhook acks: MP only looks at the status code, so skip DRF's
+# content negotiation and renderer pipeline on the hot path
+WEBHOOK_IGNORED = b'{"status": "ignored"}'
+WEBHOOK_ALREADY_PROCESSED = b'{"status": "already_processed"}'
+WEBHOOK_QUEUED = b'{"status": "queued"}'
+
+
+def webhook_ack(body):
+    return HttpResponse(body, status=200, content_type="application/json")
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -281,22 +259,31 @@ class MercadoPagoWebhookView(APIView):
     def post(self, request, *args, **kwargs):
         webhook_received_at = timezone.now()
         try:
+            # MP also sends the type as a query arg (?type= or legacy ?topic=):
+            # drop merchant_order/heartbeat traffic before parsing the body
+            query_type = request.query_params.get("type") or request.query_params.get("topic")
+            if query_type is not None and query_type != "payment":
+                logger.info("Ignoring non-payment notification", extra={"type": query_type})
+                return webhook_ack(WEBHOOK_IGNORED)
+
             # Extract notification data
             data = request.data
-            logger.info(
-                "Webhook received",
-                extra={"data": data, "timestamp": webhook_received_at.isoformat()}
-            )
 
             # Get notification type
             notification_type = data.get("type")
+            logger.info(
+                "Webhook received",
+                extra={"type": notification_type, "timestamp": webhook_received_at.isoformat()}
+            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Webhook payload", extra={"data": data})
             
             if notification_type != "payment":
                 logger.warning(
                     "Ignoring non-payment notification",
                     extra={"type": notification_type},
                 )
-                return Response({"status": "ignored"}, status=200)
+                return webhook_ack(WEBHOOK_IGNORED)
 
             # Extract payment ID from data
             payment_data = data.get("data", {})
@@ -309,10 +296,13 @@ class MercadoPagoWebhookView(APIView):
                     status=400,
                 )
 
-            # Find Payment in database
-            try:
-                payment = Payment.all_objects.get(payment_id_external=str(payment_id_external))
-            except Payment.DoesNotExist:
+            # Find Payment in database (id + flag only: no full-row hydration on retries)
+            row = (
+                Payment.all_objects.filter(payment_id_external=str(payment_id_external))
+                .values_list("id", "webhook_processed")
+                .first()
+            )
+            if row is None:
                 logger.warning(
                     "Payment not found for webhook",
                     extra={"payment_id_external": payment_id_external},
@@ -321,119 +311,31 @@ class MercadoPagoWebhookView(APIView):
                     {"error": {"code": "PAYMENT_NOT_FOUND", "message": "Payment not found"}},
                     status=404,
                 )
+            payment_id, webhook_processed = row
 
             # Check if already processed (idempotency)
-            if payment.webhook_processed:
+            if webhook_processed:
                 logger.info(
                     "Webhook already processed - idempotency check passed",
                     extra={
-                        "payment_id": payment.id,
-                        "payment_id_external": payment_id_external,
-                        "timestamp": webhook_received_at.isoformat(),
-                    },
-                )
-                return Response({"status": "already_processed"}, status=200)
-
-            # Query Mercado Pago API for payment status
-            try:
-                import mercadopago
-
-                sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
-                payment_info = sdk.payment().get(payment_id_external)
-                payment_response = payment_info.get("response", {})
-
-                if not payment_response:
-                    raise Exception("Empty response from Mercado Pago API")
-
-                mp_status = payment_response.get("status")
-                logger.info(
-                    "Payment status from MP",
-                    extra={
-                        "payment_id": payment.id,
+                        "payment_id": payment_id,
                         "payment_id_external": payment_id_external,
-                        "mp_status": mp_status,
                         "timestamp": webhook_received_at.isoformat(),
                     },
                 )
+                return webhook_ack(WEBHOOK_ALREADY_PROCESSED)
 
-                # Update payment and appointment if approved (with transaction for atomicity)
-                if mp_status == "approved":
-                    with transaction.atomic():
-                        # Re-fetch with select_for_update to lock the row
-                        payment = Payment.all_objects.select_for_update().get(pk=payment.id)
-                        
-                        # Double-check if already processed (race condition protection)
-                        if payment.webhook_processed:
-                            logger.info(
-                                "Payment already processed during transaction",
-                                extra={"payment_id": payment.id},
-                            )
-                            return Response({"status": "already_processed"}, status=200)
-                        
-                        payment.status = "APPROVED"
-                        payment.webhook_processed = True
-                        payment.save()
-
-                        appointment = payment.appointment
-                        appointment.status = "CONFIRMED"
-                        appointment.save()
-
-                    logger.info(
-                        "Payment approved and appointment confirmed",
-                        extra={
-                            "payment_id": payment.id,
-                            "appointment_id": appointment.id,
-                            "tenant_id": appointment.tenant_id,
-                            "timestamp": webhook_received_at.isoformat(),
-                        },
-                    )
-
-                    return Response({"status": "processed", "payment_status": "approved"}, status=200)
-                    
-                elif mp_status == "rejected":
-                    with transaction.atomic():
-                        # Re-fetch with select_for_update to lock the row
-                        payment = Payment.all_objects.select_for_update().get(pk=payment.id)
-                        
-                        # Double-check if already processed
-                        if payment.webhook_processed:
-                            logger.info(
-                                "Payment already processed during transaction",
-                                extra={"payment_id": payment.id},
-                            )
-                            return Response({"status": "already_processed"}, status=200)
-                        
-                        payment.status = "REJECTED"
-                        payment.webhook_processed = True
-                        payment.save()
-
-                    logger.info(
-                        "Payment rejected",
-                        extra={
-                            "payment_id": payment.id,
-                            "mp_status": mp_status,
-                            "timestamp": webhook_received_at.isoformat(),
-                        },
-                    )
-
-                    return Response({"status": "processed", "payment_status": "rejected"}, status=200)
-                else:
-                    logger.info(
-                        "Payment status not final",
-                        extra={"payment_id": payment.id, "mp_status": mp_status},
-                    )
-                    return Response({"status": "pending", "payment_status": mp_status}, status=200)
-
-            except Exception as e:
-                logger.error(
-                    "Error querying Mercado Pago API",
-                    extra={"payment_id": payment.id, "error": str(e)},
-                    exc_info=True,
-                )
-                return Response(
-                    {"error": {"code": "MP_API_ERROR", "message": str(e)}},
-                    status=500,
-                )
+            # MP status query and state transition run in the worker
+            process_mp_webhook.delay(payment_id, str(payment_id_external))
+            logger.info(
+                "Webhook queued for processing",
+                extra={
+                    "payment_id": payment_id,
+                    "payment_id_external": payment_id_external,
+                    "timestamp": webhook_received_at.isoformat(),
+                },
+            )
+            return webhook_ack(WEBHOOK_QUEUED)
 
         except Exception as e:
             logger.error("Webhook processing error", extra={"error": str(e)}, exc_info=True)
@@ -1,20 +1,170 @@
 """
 pytest configuration and shared fixtures for business rules tests.
 """
+import itertools
+
+import freezegun
 import pytest
+import responses
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connections
+from django.db.models.signals import pre_migrate
 from django.utils import timezone
+from pytest_factoryboy import LazyFixture, register
+from rest_framework.test import APIClient
 from core.context import clear_current_tenant, set_current_tenant
+from tests.factories import (
+    AppointmentFactory,
+    CustomerFactory,
+    PetFactory,
+    ServiceFactory,
+    TenantFactory,
+    UserFactory,
+    reset_factory_cache,
+)
+
+# `customer`, `pet`, `service` and `appointment` fixtures, built only when a test
+# asks for them. Their tenant SubFactory is pinned to the `tenant` fixture below
+# (the shared module tenant), so TenantFactory/UserFactory are not registered.
+register(CustomerFactory, tenant=LazyFixture("tenant"))
+register(PetFactory, tenant=LazyFixture("tenant"), customer=LazyFixture("customer"))
+register(ServiceFactory, tenant=LazyFixture("tenant"))
+register(AppointmentFactory, tenant=LazyFixture("tenant"))
+
+_shared_subdomains = itertools.count(1)
+
+
+def create_btree_gist(using, **kwargs):
+    """
+    --nomigrations builds the test schema straight from the models; the
+    no_overlap exclusion constraint needs btree_gist, which only migration
+    0008 would otherwise install.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+
+
+pre_migrate.connect(
+    create_btree_gist,
+    sender=apps.get_app_config("core"),
+    dispatch_uid="tests.create_btree_gist",
+)
 
 
 @pytest.fixture(autouse=True)
-def clear_tenant_context():
-    """Clear tenant context before and after each test."""
+def clear_tenant_context(request):
+    """
+    Clear tenant context before and after each test. Tests that take the
+    `tenant` fixture start with it as the current tenant.
+    """
     clear_current_tenant()
+    if "tenant" in request.fixturenames:
+        set_current_tenant(request.getfixturevalue("tenant"))
     yield
     clear_current_tenant()
 
 
+@pytest.fixture(autouse=True)
+def tenant_cache():
+    """Start each test with an empty tenant lookup cache (rollbacks send no signals)."""
+    cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def factory_cache():
+    """Drop factory-cached rows between tests (each test's DB work is rolled back)."""
+    yield
+    reset_factory_cache()
+
+
 @pytest.fixture
-def freeze_time():
-    """Helper to freeze time for deterministic tests."""
+def now():
+    """Single timezone.now() snapshot shared by the whole test (no hour rollover skew)."""
     return timezone.now()
+
+
+@pytest.fixture(scope="class")
+def class_api_client():
+    """One APIClient per test class; its handler loads the middleware chain once."""
+    return APIClient()
+
+
+@pytest.fixture
+def api_client(class_api_client):
+    """
+    DRF APIClient; call force_authenticate in the test as needed. Auth,
+    credentials and cookies are reset after each test (logout() would save
+    a session row).
+    """
+    yield class_api_client
+    class_api_client.force_authenticate(None)
+    class_api_client.credentials()
+    class_api_client.cookies.clear()
+
+
+@pytest.fixture
+def mp_mock():
+    """
+    Mercado Pago HTTP mock for the test; register endpoints with mp_mock.add.
+    Registered but unused responses are not an error.
+    """
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as mock:
+        yield mock
+
+
+@pytest.fixture(scope="module")
+def shared_tenant(django_db_setup, django_db_blocker):
+    """
+    One tenant for the whole test module (unique subdomain per module).
+
+    Created outside the per-test transaction, so it survives each test's
+    rollback; deleted (with its users via CASCADE) at module teardown.
+    """
+    with django_db_blocker.unblock():
+        tenant = TenantFactory(subdomain=f"shared{next(_shared_subdomains)}")
+        yield tenant
+        tenant.delete()
+
+
+@pytest.fixture(scope="module")
+def shared_owner(shared_tenant, django_db_blocker):
+    """OWNER user of shared_tenant, created once per module."""
+    with django_db_blocker.unblock():
+        return UserFactory(tenant=shared_tenant)
+
+
+@pytest.fixture(scope="module")
+def two_tenants(django_db_setup, django_db_blocker):
+    """
+    Pair of tenants for cross-tenant tests, created once per module. Rows the
+    tests attach to them are rolled back; the tenants go at module teardown.
+    """
+    with django_db_blocker.unblock():
+        n = next(_shared_subdomains)
+        tenants = (TenantFactory(subdomain=f"pair{n}a"), TenantFactory(subdomain=f"pair{n}b"))
+        yield tenants
+        for tenant in tenants:
+            tenant.delete()
+
+
+@pytest.fixture
+def tenant(shared_tenant):
+    """shared_tenant; clear_tenant_context makes it the current tenant."""
+    return shared_tenant
+
+
+@pytest.fixture
+def owner_client(shared_tenant, shared_owner):
+    """APIClient authenticated as shared_owner, with shared_tenant's Host preset."""
+    client = APIClient(HTTP_HOST=f"{shared_tenant.subdomain}.localhost:8000")
+    client.force_authenticate(user=shared_owner)
+    return client
+
+
+@pytest.fixture
+def frozen_now():
+    """Freeze the clock for the test; yields the frozen timezone.now()."""
+    with freezegun.freeze_time("2025-01-15 12:00:00+00:00"):
+        yield timezone.now()
@@ -8,10 +8,13 @@ import factory
 from django.utils import timezone
 from factory.django import DjangoModelFactory
 from faker import Faker
+from rest_framework.test import APIRequestFactory, force_authenticate
 
+from core.context import set_current_tenant
 from core.models import Appointment, Customer, Payment, Pet, Refund, Service, Tenant, User
 
 fake = Faker("pt_BR")
+api_factory = APIRequestFactory()
 
 
 class TenantFactory(DjangoModelFactory):
@@ -51,6 +54,23 @@ class CustomerFactory(DjangoModelFactory):
     phone = factory.LazyFunction(lambda: fake.phone_number()[:20])
 
 
+# Default owner for pets built without an explicit customer, one per tenant.
+# Cleared after each test by the reset_factory_cache fixture (DB is rolled back).
+_default_customers = {}
+
+
+def default_customer(tenant):
+    """Return the shared factory customer for tenant, creating it on first use."""
+    customer = _default_customers.get(tenant.pk)
+    if customer is None:
+        customer = _default_customers[tenant.pk] = CustomerFactory(tenant=tenant)
+    return customer
+
+
+def reset_factory_cache():
+    _default_customers.clear()
+
+
 class PetFactory(DjangoModelFactory):
     class Meta:
         model = Pet
@@ -59,7 +79,8 @@ class PetFactory(DjangoModelFactory):
     name = factory.Faker("first_name")
     species = factory.Iterator(["DOG", "CAT", "OTHER"])
     breed = factory.Iterator(["Labrador", "Poodle", "Siamês", "Persa", "Vira-lata"])
-    customer = factory.SubFactory(CustomerFactory, tenant=factory.SelfAttribute("..tenant"))
+    # Pets/appointments in the same tenant share one customer instead of one INSERT each
+    customer = factory.LazyAttribute(lambda o: default_customer(o.tenant))
     birth_date = factory.LazyFunction(lambda: timezone.now().date() - timedelta(days=365 * 2))
 
 
@@ -117,3 +138,45 @@ class RefundFactory(DjangoModelFactory):
     amount = Decimal("45.00")
     status = "PENDING"
     reason = factory.Faker("sentence")
+
+
+def make_apt_with_payment(
+    tenant, scheduled_in, amount, payment_status="APPROVED", status="CONFIRMED", **payment_fields
+):
+    """
+    Appointment (CONFIRMED unless status says otherwise) scheduled_in (timedelta)
+    from now with a payment (APPROVED unless payment_status says otherwise);
+    payment_fields go to the Payment (e.g. payment_id_external). The payment is
+    cached on the returned appointment as apt.payment.
+
+    Both rows go in through bulk_create: end_time is computed here instead of by
+    Appointment.save(), which skips its Service lookup.
+    """
+    pet = PetFactory(tenant=tenant)
+    service = ServiceFactory(tenant=tenant)
+    scheduled_at = timezone.now() + scheduled_in
+    apt = Appointment(
+        tenant=tenant,
+        pet=pet,
+        service=service,
+        scheduled_at=scheduled_at,
+        end_time=scheduled_at + timedelta(minutes=service.duration_minutes),
+        status=status,
+    )
+    Appointment.all_objects.bulk_create([apt])
+    Payment.all_objects.bulk_create(
+        [Payment(tenant=tenant, appointment=apt, amount=amount, status=payment_status, **payment_fields)]
+    )
+    return apt
+
+
+def tenant_request(method, path, user, tenant, data=None):
+    """
+    Request as TenantMiddleware + auth leave it, for calling a view directly
+    (no URL resolution or middleware stack).
+    """
+    request = getattr(api_factory, method)(path, data, format="json")
+    force_authenticate(request, user=user)
+    request.tenant = tenant
+    set_current_tenant(tenant)
+    return request
@@ -0,0 +1,20 @@
+"""
+Settings for the pytest run.
+
+SQLite is not an option: the schema relies on PostgreSQL-only features
+(btree_gist exclusion constraint over tstzrange), so tests keep Postgres
+and only relax what costs time without changing query semantics.
+"""
+from config.settings import *  # noqa: F401,F403
+
+# Commits don't wait for the WAL flush (fixture setup, migrations, flushes).
+# Per-session setting, so no server config change is needed. Appended so any
+# libpq options already configured (e.g. a search_path) are kept.
+_db_options = DATABASES["default"].setdefault("OPTIONS", {})
+_db_options["options"] = f'{_db_options.get("options", "")} -c synchronous_commit=off'.lstrip()
+
+# Celery tasks run inline: no broker in tests
+CELERY_TASK_ALWAYS_EAGER = True
+
+# PBKDF2 is deliberately slow; UserFactory and login tests hash on every user
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
@@ -7,263 +7,244 @@ CANCELLED e EXPIRED não bloqueiam slots.
 """
 import pytest
 from datetime import timedelta
-from django.utils import timezone
-from rest_framework.test import APIClient
+from types import SimpleNamespace
 from core.context import set_current_tenant
-from core.models import Appointment
+from core.models import Appointment, Customer, Pet, Service, Tenant, User
 from tests.factories import (
     TenantFactory,
     UserFactory,
+    CustomerFactory,
     PetFactory,
     ServiceFactory,
-    AppointmentFactory,
 )
 
+POOL_SUBDOMAINS = ["conflict1", "conflict2"]
+
+
+@pytest.fixture(scope="module")
+def conflict_pool(django_db_setup, django_db_blocker):
+    """
+    Tenants (com user, pet e service de 60 min) criados uma vez para o módulo,
+    com um bulk_create por tabela. Os testes só criam appointments, que são
+    desfeitos pelo rollback de cada teste; o pool é removido no teardown.
+    """
+    with django_db_blocker.unblock():
+        # Sobras de uma execução interrompida (--reuse-db mantém o banco)
+        Tenant.objects.filter(subdomain__in=POOL_SUBDOMAINS).delete()
+        tenants = Tenant.objects.bulk_create(
+            [TenantFactory.build(subdomain=subdomain) for subdomain in POOL_SUBDOMAINS]
+        )
+        users = User.objects.bulk_create([UserFactory.build(tenant=t) for t in tenants])
+        customers = Customer.objects.bulk_create([CustomerFactory.build(tenant=t) for t in tenants])
+        pets = Pet.objects.bulk_create(
+            [PetFactory.build(tenant=t, customer=c) for t, c in zip(tenants, customers)]
+        )
+        services = Service.objects.bulk_create(
+            [ServiceFactory.build(tenant=t, duration_minutes=60) for t in tenants]
+        )
+        yield [
+            SimpleNamespace(tenant=t, user=u, pet=p, service=sv, host=f"{t.subdomain}.localhost:8000")
+            for t, u, p, sv in zip(tenants, users, pets, services)
+        ]
+        # CASCADE leva users, customers, pets e services junto
+        Tenant.objects.filter(pk__in=[t.pk for t in tenants]).delete()
+
+
+@pytest.fixture
+def shop(conflict_pool):
+    """Primeiro tenant do pool, já definido como tenant corrente."""
+    shop = conflict_pool[0]
+    set_current_tenant(shop.tenant)
+    return shop
+
+
+@pytest.fixture(scope="module")
+def shared_tenant(conflict_pool):
+    """Tenant do shop no lugar do tenant compartilhado: owner_client passa a apontar para ele."""
+    return conflict_pool[0].tenant
+
+
+@pytest.fixture(scope="module")
+def shared_owner(conflict_pool):
+    """User do shop, autenticado pelo owner_client do conftest."""
+    return conflict_pool[0].user
+
 
 @pytest.mark.django_db
 class TestAppointmentConflict:
     """RN04: Appointment overlap detection."""
 
-    def test_overlapping_appointments_are_rejected(self):
+    def test_overlapping_appointments_are_rejected(self, owner_client, shop, now):
         """Appointments sobrepostos para mesmo tenant retornam 409 CONFLICT_SCHEDULE."""
-        tenant = TenantFactory(subdomain="conflict1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        pet = PetFactory(tenant=tenant)
-        service = ServiceFactory(tenant=tenant, duration_minutes=60)
-        
         # Criar primeiro appointment: 14:00-15:00
-        scheduled_at = timezone.now() + timedelta(days=1, hours=14 - timezone.now().hour)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
+        scheduled_at = now + timedelta(days=1, hours=14 - now.hour)
         
-        r1 = client.post(
+        r1 = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": scheduled_at.isoformat(),
             },
             format="json",
-            HTTP_HOST="conflict1.localhost:8000",
         )
         assert r1.status_code == 201
         
         # Tentar criar segundo appointment sobreposto: 14:30-15:30
         overlapping_time = scheduled_at + timedelta(minutes=30)
-        r2 = client.post(
+        r2 = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": overlapping_time.isoformat(),
             },
             format="json",
-            HTTP_HOST="conflict1.localhost:8000",
         )
         
         assert r2.status_code == 409
         assert r2.data["error"]["code"] == "CONFLICT_SCHEDULE"
 
-    def test_edge_case_appointments_touching_at_boundary_are_allowed(self):
+    def test_edge_case_appointments_touching_at_boundary_are_allowed(self, owner_client, shop, now):
         """Appointments que se tocam exatamente no limite (15:00-16:00, 16:00-17:00) são permitidos."""
-        tenant = TenantFactory(subdomain="touch")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        pet = PetFactory(tenant=tenant)
-        service = ServiceFactory(tenant=tenant, duration_minutes=60)
-        
-        base_time = timezone.now() + timedelta(days=1)
+        base_time = now + timedelta(days=1)
         scheduled_at1 = base_time.replace(hour=15, minute=0, second=0, microsecond=0)
         scheduled_at2 = scheduled_at1 + timedelta(hours=1)  # 16:00
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        r1 = client.post(
+        r1 = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": scheduled_at1.isoformat(),
             },
             format="json",
-            HTTP_HOST="touch.localhost:8000",
         )
         assert r1.status_code == 201
         
-        r2 = client.post(
+        r2 = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": scheduled_at2.isoformat(),
             },
             format="json",
-            HTTP_HOST="touch.localhost:8000",
         )
         # Deve ser permitido (range [15:00, 16:00) não sobrepõe [16:00, 17:00))
         assert r2.status_code == 201
 
-    def test_edge_case_overlap_by_one_second_is_detected(self):
+    def test_edge_case_overlap_by_one_second_is_detected(self, owner_client, shop, now):
         """Overlap de 1 segundo é detectado."""
-        tenant = TenantFactory(subdomain="onesec")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        pet = PetFactory(tenant=tenant)
-        service = ServiceFactory(tenant=tenant, duration_minutes=60)
-        
-        base_time = timezone.now() + timedelta(days=1)
+        base_time = now + timedelta(days=1)
         scheduled_at1 = base_time.replace(hour=14, minute=0, second=0, microsecond=0)
         # 1 segundo antes do fim: 14:59:59
         scheduled_at2 = scheduled_at1 + timedelta(minutes=59, seconds=59)
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        r1 = client.post(
+        r1 = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": scheduled_at1.isoformat(),
             },
             format="json",
-            HTTP_HOST="onesec.localhost:8000",
         )
         assert r1.status_code == 201
         
-        r2 = client.post(
+        r2 = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": scheduled_at2.isoformat(),
             },
             format="json",
-            HTTP_HOST="onesec.localhost:8000",
         )
         assert r2.status_code == 409
 
-    def test_cancelled_appointment_does_not_block_slot(self):
+    def test_cancelled_appointment_does_not_block_slot(self, owner_client, shop, now):
         """Appointment CANCELLED não bloqueia o horário."""
-        tenant = TenantFactory(subdomain="cancel")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        pet = PetFactory(tenant=tenant)
-        service = ServiceFactory(tenant=tenant, duration_minutes=60)
-        
-        scheduled_at = timezone.now() + timedelta(days=1, hours=10 - timezone.now().hour)
+        scheduled_at = now + timedelta(days=1, hours=10 - now.hour)
         
         # Criar e cancelar appointment
-        apt = AppointmentFactory(
-            tenant=tenant,
-            pet=pet,
-            service=service,
+        Appointment.objects.create(
+            tenant=shop.tenant,
+            pet=shop.pet,
+            service=shop.service,
             scheduled_at=scheduled_at,
             status="CANCELLED",
         )
         
         # Tentar criar novo appointment no mesmo horário deve funcionar
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+        response = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": scheduled_at.isoformat(),
             },
             format="json",
-            HTTP_HOST="cancel.localhost:8000",
         )
         assert response.status_code == 201
 
-    def test_expired_appointment_does_not_block_slot(self):
+    def test_expired_appointment_does_not_block_slot(self, owner_client, shop, now):
         """Appointment EXPIRED não bloqueia o horário."""
-        tenant = TenantFactory(subdomain="expire")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        pet = PetFactory(tenant=tenant)
-        service = ServiceFactory(tenant=tenant, duration_minutes=60)
-        
-        scheduled_at = timezone.now() + timedelta(days=1, hours=11 - timezone.now().hour)
+        scheduled_at = now + timedelta(days=1, hours=11 - now.hour)
         
         # Criar appointment expirado
-        apt = AppointmentFactory(
-            tenant=tenant,
-            pet=pet,
-            service=service,
+        Appointment.objects.create(
+            tenant=shop.tenant,
+            pet=shop.pet,
+            service=shop.service,
             scheduled_at=scheduled_at,
             status="EXPIRED",
         )
         
         # Tentar criar novo appointment no mesmo horário deve funcionar
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+        response = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet.id,
-                "service_id": service.id,
+                "pet_id": shop.pet.id,
+                "service_id": shop.service.id,
                 "scheduled_at": scheduled_at.isoformat(),
             },
             format="json",
-            HTTP_HOST="expire.localhost:8000",
         )
         assert response.status_code == 201
 
-    def test_different_tenants_can_overlap(self):
+    def test_different_tenants_can_overlap(self, api_client, conflict_pool, now):
         """Appointments de tenants diferentes podem sobrepor horários."""
-        tenant1 = TenantFactory(subdomain="t1")
-        tenant2 = TenantFactory(subdomain="t2")
-        user1 = UserFactory(tenant=tenant1)
-        user2 = UserFactory(tenant=tenant2)
+        shop1, shop2 = conflict_pool
         
-        scheduled_at = timezone.now() + timedelta(days=1, hours=12 - timezone.now().hour)
+        scheduled_at = now + timedelta(days=1, hours=12 - now.hour)
         
         # Criar appointment no tenant1
-        set_current_tenant(tenant1)
-        pet1 = PetFactory(tenant=tenant1)
-        service1 = ServiceFactory(tenant=tenant1, duration_minutes=60)
-        
-        client1 = APIClient()
-        client1.force_authenticate(user=user1)
-        r1 = client1.post(
+        set_current_tenant(shop1.tenant)
+        api_client.force_authenticate(user=shop1.user)
+        r1 = api_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet1.id,
-                "service_id": service1.id,
+                "pet_id": shop1.pet.id,
+                "service_id": shop1.service.id,
                 "scheduled_at": scheduled_at.isoformat(),
             },
             format="json",
-            HTTP_HOST="t1.localhost:8000",
+            HTTP_HOST=shop1.host,
         )
         assert r1.status_code == 201
         
         # Criar appointment no tenant2 no MESMO horário deve funcionar
-        set_current_tenant(tenant2)
-        pet2 = PetFactory(tenant=tenant2)
-        service2 = ServiceFactory(tenant=tenant2, duration_minutes=60)
-        
-        client2 = APIClient()
-        client2.force_authenticate(user=user2)
-        r2 = client2.post(
+        set_current_tenant(shop2.tenant)
+        api_client.force_authenticate(user=shop2.user)
+        r2 = api_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": pet2.id,
-                "service_id": service2.id,
+                "pet_id": shop2.pet.id,
+                "service_id": shop2.service.id,
                 "scheduled_at": scheduled_at.isoformat(),
             },
             format="json",
-            HTTP_HOST="t2.localhost:8000",
+            HTTP_HOST=shop2.host,
         )
         assert r2.status_code == 201
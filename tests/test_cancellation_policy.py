@@ -10,135 +10,44 @@ Cria registro Refund com status PENDING.
 import pytest
 from datetime import timedelta
 from decimal import Decimal
+from unittest.mock import patch
 from django.utils import timezone
-from rest_framework.test import APIClient
-from core.context import set_current_tenant
-from core.models import Refund, Payment
+from core.models import Appointment, Refund
 from core.services import CancellationService
-from tests.factories import TenantFactory, UserFactory, AppointmentFactory
+from core.views import AppointmentViewSet
+from tests.factories import AppointmentFactory, make_apt_with_payment
 
 
 @pytest.mark.django_db
 class TestCancellationPolicy:
     """RN07: Cancellation policy and refund calculation."""
 
-    def test_cancel_over_24h_refunds_90_percent(self):
-        """Cancelamento >24h antes: reembolso 90%."""
-        tenant = TenantFactory(subdomain="cancel1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        # Appointment daqui 30 horas
-        scheduled_at = timezone.now() + timedelta(hours=30)
-        apt = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=scheduled_at,
-            status="CONFIRMED",
-        )
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="APPROVED",
-        )
-        
-        refund = CancellationService.calculate_refund(apt)
-        assert refund == Decimal("45.00")  # 90% de 50
-
-    def test_cancel_between_24h_2h_refunds_80_percent(self):
-        """Cancelamento 24h-2h antes (23h): reembolso 80%."""
-        tenant = TenantFactory(subdomain="cancel2")
-        set_current_tenant(tenant)
-        
-        # Appointment daqui 23 horas
-        scheduled_at = timezone.now() + timedelta(hours=23)
-        apt = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=scheduled_at,
-            status="CONFIRMED",
-        )
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="APPROVED",
-        )
+    @pytest.mark.parametrize(
+        "scheduled_in,amount,expected",
+        [
+            # >24h: 90%
+            pytest.param(timedelta(hours=30), "50.00", "45.00", id="over_24h_90_percent"),
+            # Logo acima de 24h (24h + 1 minuto): ainda 90%
+            pytest.param(timedelta(hours=24, minutes=1), "100.00", "90.00", id="just_over_24h_90_percent"),
+            # Exatamente 24h: 80% (edge case, hours_until > 24 é falso)
+            pytest.param(timedelta(hours=24), "100.00", "80.00", id="exactly_24h_80_percent"),
+            # 24h-2h (23h): 80%
+            pytest.param(timedelta(hours=23), "50.00", "40.00", id="between_24h_2h_80_percent"),
+            # Exatamente 2h: 80% (hours_until >= 2)
+            pytest.param(timedelta(hours=2), "100.00", "80.00", id="exactly_2h_80_percent"),
+            # <2h (1h): sem reembolso
+            pytest.param(timedelta(hours=1), "50.00", "0.00", id="under_2h_no_refund"),
+        ],
+    )
+    def test_cancel_refund_percentage(self, tenant, frozen_now, scheduled_in, amount, expected):
+        """Reembolso calculado pela antecedência do cancelamento (relógio congelado)."""
+        apt = make_apt_with_payment(tenant, scheduled_in, Decimal(amount))
         
         refund = CancellationService.calculate_refund(apt)
-        assert refund == Decimal("40.00")  # 80% de 50
+        assert refund == Decimal(expected)
 
-    def test_cancel_exactly_24h_refunds_80_percent(self):
-        """Cancelamento exatamente 24h antes: reembolso 80% (edge case)."""
-        tenant = TenantFactory(subdomain="cancel24")
-        set_current_tenant(tenant)
-        
-        # Appointment daqui 24h + 1 minuto
-        scheduled_at = timezone.now() + timedelta(hours=24, minutes=1)
-        apt = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=scheduled_at,
-            status="CONFIRMED",
-        )
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("100.00"),
-            status="APPROVED",
-        )
-        
-        refund = CancellationService.calculate_refund(apt)
-        # >24h: deve retornar 90%
-        assert refund == Decimal("90.00")
-
-    def test_cancel_under_2h_no_refund(self):
-        """Cancelamento <2h antes (1h): sem reembolso (0%)."""
-        tenant = TenantFactory(subdomain="cancel3")
-        set_current_tenant(tenant)
-        
-        # Appointment daqui 1 hora
-        scheduled_at = timezone.now() + timedelta(hours=1)
-        apt = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=scheduled_at,
-            status="CONFIRMED",
-        )
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="APPROVED",
-        )
-        
-        refund = CancellationService.calculate_refund(apt)
-        assert refund == Decimal("0.00")
-
-    def test_cancel_exactly_2h_refunds_80_percent(self):
-        """Cancelamento exatamente 2h antes: reembolso 80% (hours_until >= 2)."""
-        tenant = TenantFactory(subdomain="cancel2h")
-        set_current_tenant(tenant)
-        
-        # Appointment daqui 2h + 1 minuto
-        scheduled_at = timezone.now() + timedelta(hours=2, minutes=1)
-        apt = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=scheduled_at,
-            status="CONFIRMED",
-        )
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("100.00"),
-            status="APPROVED",
-        )
-        
-        refund = CancellationService.calculate_refund(apt)
-        assert refund == Decimal("80.00")  # 80% de 100
-
-    def test_cancel_without_payment_returns_zero(self):
+    def test_cancel_without_payment_returns_zero(self, tenant):
         """Cancelamento sem pagamento: reembolso 0."""
-        tenant = TenantFactory(subdomain="cancel4")
-        set_current_tenant(tenant)
-        
         scheduled_at = timezone.now() + timedelta(hours=30)
         apt = AppointmentFactory(
             tenant=tenant,
@@ -150,34 +59,32 @@ class TestCancellationPolicy:
         refund = CancellationService.calculate_refund(apt)
         assert refund == Decimal("0.00")
 
-    def test_cancel_endpoint_creates_refund_record(self):
-        """POST /appointments/{id}/cancel/ cria registro Refund."""
-        tenant = TenantFactory(subdomain="cancel5")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
+    def test_cancel_creates_refund_via_service(self, tenant):
+        """CancellationService.cancel cancela o appointment e cria Refund PENDING."""
+        apt = make_apt_with_payment(tenant, timedelta(hours=30), Decimal("50.00"))
         
-        scheduled_at = timezone.now() + timedelta(hours=30)
-        apt = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=scheduled_at,
-            status="CONFIRMED",
-        )
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="APPROVED",
-        )
+        refund = CancellationService.cancel(apt, reason="Cliente desistiu")
         
-        client = APIClient()
-        client.force_authenticate(user=user)
+        apt.refresh_from_db()
+        assert apt.status == "CANCELLED"
+        assert Refund.all_objects.get(appointment=apt) == refund
+        assert refund.amount == Decimal("45.00")
+        assert refund.status == "PENDING"
+        assert refund.reason == "Cliente desistiu"
+
+    @pytest.mark.slow
+    def test_cancel_endpoint_creates_refund_record(self, tenant, owner_client, django_assert_max_num_queries):
+        """POST /appointments/{id}/cancel/ cria registro Refund."""
+        apt = make_apt_with_payment(tenant, timedelta(hours=30), Decimal("50.00"))
         
-        response = client.post(
-            f"/api/appointments/{apt.id}/cancel/",
-            {"reason": "Cliente desistiu"},
-            format="json",
-            HTTP_HOST="cancel5.localhost:8000",
-        )
+        # Guarda contra N+1: tenant, appointment, payment, UPDATE appointment,
+        # INSERT refund
+        with django_assert_max_num_queries(5):
+            response = owner_client.post(
+                f"/api/appointments/{apt.id}/cancel/",
+                {"reason": "Cliente desistiu"},
+                format="json",
+            )
         
         assert response.status_code == 200
         assert "refund_amount" in response.data
@@ -189,21 +96,35 @@ class TestCancellationPolicy:
         assert refund.status == "PENDING"
         assert refund.reason == "Cliente desistiu"
 
-    def test_cancel_prebooked_returns_400(self):
+    @pytest.mark.slow
+    def test_cancel_endpoint_on_deleted_appointment_returns_404(self, tenant, owner_client):
+        """Appointment removido entre get_object() e o UPDATE: 404, sem Refund."""
+        apt = make_apt_with_payment(tenant, timedelta(hours=30), Decimal("50.00"))
+        get_object = AppointmentViewSet.get_object
+
+        def get_object_then_delete(view):
+            obj = get_object(view)
+            Appointment.all_objects.filter(pk=obj.pk).delete()
+            return obj
+
+        with patch.object(AppointmentViewSet, "get_object", get_object_then_delete):
+            response = owner_client.post(
+                f"/api/appointments/{apt.id}/cancel/",
+                {"reason": "Cliente desistiu"},
+                format="json",
+            )
+        
+        assert response.status_code == 404
+        assert not Refund.all_objects.filter(appointment_id=apt.id).exists()
+
+    @pytest.mark.slow
+    def test_cancel_prebooked_returns_400(self, tenant, owner_client):
         """Cancelar appointment PRE_BOOKED retorna 400 INVALID_STATUS."""
-        tenant = TenantFactory(subdomain="cancel6")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
         apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+        response = owner_client.post(
             f"/api/appointments/{apt.id}/cancel/",
             format="json",
-            HTTP_HOST="cancel6.localhost:8000",
         )
         
         assert response.status_code == 400
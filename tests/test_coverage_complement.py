@@ -6,12 +6,19 @@ import pytest
 from decimal import Decimal
 from django.utils import timezone
 from datetime import timedelta
-from rest_framework.test import APIClient
 from core.context import set_current_tenant
 from core.models import User, Customer, Pet, Service
 from core.permissions import IsOwner, IsOwnerOrAttendant
 from core.exceptions import InvalidCPFError, PaymentFailedError, TenantNotFoundError
-from tests.factories import TenantFactory, UserFactory, CustomerFactory, PetFactory, ServiceFactory
+from core.views import CustomerViewSet, PetViewSet, ServiceViewSet
+from tests.factories import (
+    TenantFactory,
+    UserFactory,
+    CustomerFactory,
+    PetFactory,
+    ServiceFactory,
+    tenant_request,
+)
 
 
 @pytest.mark.django_db
@@ -34,9 +41,7 @@ class TestModelsCoverage:
 
     def test_tenant_aware_model_save_without_tenant_raises_error(self):
         """TenantAwareModel.save() sem tenant e sem context levanta ValueError."""
-        from core.context import clear_current_tenant
-        clear_current_tenant()
-        
+        # Sem o fixture `tenant`, o teste começa sem tenant corrente
         tenant = TenantFactory()
         # Tentar criar customer sem tenant e sem context
         customer = Customer(
@@ -72,23 +77,17 @@ class TestModelsCoverage:
 class TestSerializersCoverage:
     """Testes para cobrir serializers.py."""
 
-    def test_customer_serializer_validates_cpf_format(self):
+    def test_customer_serializer_validates_cpf_format(self, tenant, shared_owner):
         """CustomerSerializer valida formato de CPF."""
-        from core.serializers import CustomerSerializer
-        
-        tenant = TenantFactory()
-        user = UserFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
         # CPF muito curto
-        response = client.post(
+        request = tenant_request(
+            "post",
             "/api/customers/",
+            shared_owner,
+            tenant,
             {"name": "Test", "cpf": "123", "email": "t@t.com", "phone": "11999999999"},
-            format="json",
-            HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
+        response = CustomerViewSet.as_view({"post": "create"})(request)
         assert response.status_code == 400
 
     def test_pet_serializer_customer_wrong_tenant(self):
@@ -100,52 +99,43 @@ class TestSerializersCoverage:
         set_current_tenant(tenant1)
         customer_t1 = CustomerFactory(tenant=tenant1)
         
-        client = APIClient()
-        client.force_authenticate(user=user2)
-        
-        response = client.post(
+        request = tenant_request(
+            "post",
             "/api/pets/",
+            user2,
+            tenant2,
             {
                 "name": "Dog",
                 "species": "DOG",
                 "breed": "Lab",
                 "customer": customer_t1.id,
             },
-            format="json",
-            HTTP_HOST="t2.localhost:8000",
         )
+        response = PetViewSet.as_view({"post": "create"})(request)
         assert response.status_code == 400
 
-    def test_service_serializer_negative_price(self):
+    def test_service_serializer_negative_price(self, tenant, shared_owner):
         """ServiceSerializer rejeita preço negativo."""
-        tenant = TenantFactory()
-        user = UserFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+        request = tenant_request(
+            "post",
             "/api/services/",
+            shared_owner,
+            tenant,
             {"name": "Test", "price": -10, "duration_minutes": 60},
-            format="json",
-            HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
+        response = ServiceViewSet.as_view({"post": "create"})(request)
         assert response.status_code == 400
 
-    def test_service_serializer_zero_duration(self):
+    def test_service_serializer_zero_duration(self, tenant, shared_owner):
         """ServiceSerializer rejeita duração zero."""
-        tenant = TenantFactory()
-        user = UserFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+        request = tenant_request(
+            "post",
             "/api/services/",
+            shared_owner,
+            tenant,
             {"name": "Test", "price": 50, "duration_minutes": 0},
-            format="json",
-            HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
+        response = ServiceViewSet.as_view({"post": "create"})(request)
         assert response.status_code == 400
 
 
@@ -159,20 +149,12 @@ class TestPermissionsCoverage:
         owner = UserFactory(tenant=tenant, role="OWNER")
         attendant = UserFactory(tenant=tenant, role="ATTENDANT")
         
-        client = APIClient()
-        
-        # OWNER deve conseguir criar tenant (permission IsAdminUser)
-        client.force_authenticate(user=owner)
-        
-        # Test via real API endpoint que usa IsOwnerOrAttendant
         set_current_tenant(tenant)
         customer = CustomerFactory(tenant=tenant)
         
         # Get customer - IsOwnerOrAttendant permite
-        response = client.get(
-            f"/api/customers/{customer.id}/",
-            HTTP_HOST="perm1.localhost:8000"
-        )
+        request = tenant_request("get", f"/api/customers/{customer.id}/", owner, tenant)
+        response = CustomerViewSet.as_view({"get": "retrieve"})(request, pk=customer.id)
         assert response.status_code == 200
 
     def test_is_owner_or_attendant_allows_both_roles(self):
@@ -180,17 +162,14 @@ class TestPermissionsCoverage:
         tenant = TenantFactory(subdomain="perm2")
         attendant = UserFactory(tenant=tenant, role="ATTENDANT")
         
-        client = APIClient()
-        client.force_authenticate(user=attendant)
-        
         # ATTENDANT deve conseguir listar customers
-        response = client.get("/api/customers/", HTTP_HOST="perm2.localhost:8000")
+        request = tenant_request("get", "/api/customers/", attendant, tenant)
+        response = CustomerViewSet.as_view({"get": "list"})(request)
         assert response.status_code == 200
 
 
-@pytest.mark.django_db
 class TestExceptionsCoverage:
-    """Testes para cobrir exceptions.py com code customizado."""
+    """Testes para cobrir exceptions.py com code customizado (sem banco)."""
 
     def test_api_error_with_custom_code(self):
         """APIError aceita código customizado."""
@@ -200,56 +179,48 @@ class TestExceptionsCoverage:
         assert error.code == "CUSTOM_CODE"
         assert str(error) == "Custom message"
 
-    def test_invalid_cpf_error(self):
-        """InvalidCPFError tem código INVALID_CPF."""
-        error = InvalidCPFError()
-        assert error.code == "INVALID_CPF"
-        assert "inválido" in str(error).lower()
-
-    def test_payment_failed_error(self):
-        """PaymentFailedError tem código PAYMENT_FAILED."""
-        error = PaymentFailedError()
-        assert error.code == "PAYMENT_FAILED"
-
-    def test_tenant_not_found_error(self):
-        """TenantNotFoundError tem código TENANT_NOT_FOUND."""
-        error = TenantNotFoundError()
-        assert error.code == "TENANT_NOT_FOUND"
+    @pytest.mark.parametrize(
+        "exc_class,code,message",
+        [
+            (InvalidCPFError, "INVALID_CPF", "CPF inválido."),
+            (PaymentFailedError, "PAYMENT_FAILED", "Falha no pagamento"),
+            (TenantNotFoundError, "TENANT_NOT_FOUND", "Tenant não encontrado"),
+        ],
+    )
+    def test_default_code_and_message(self, exc_class, code, message):
+        """Exceções sem argumentos usam o código e a mensagem padrão."""
+        error = exc_class()
+        assert error.code == code
+        assert str(error) == message
 
 
 @pytest.mark.django_db
 class TestViewsCoverage:
     """Testes para cobrir branches de views.py."""
 
-    def test_health_endpoint(self):
+    def test_health_endpoint(self, api_client, shared_tenant):
         """GET /api/health/ retorna OK."""
-        tenant = TenantFactory(subdomain="health")
-        client = APIClient()
-        response = client.get("/api/health/", HTTP_HOST="health.localhost:8000")
+        response = api_client.get("/api/health/", HTTP_HOST=f"{shared_tenant.subdomain}.localhost:8000")
         assert response.status_code == 200
         assert response.json()["status"] == "ok"
 
-    def test_tenant_info_endpoint(self):
+    def test_tenant_info_endpoint(self, api_client, shared_tenant):
         """GET /api/tenant-info/ retorna info do tenant."""
-        tenant = TenantFactory(subdomain="info")
-        
-        client = APIClient()
-        response = client.get("/api/tenant-info/", HTTP_HOST="info.localhost:8000")
+        response = api_client.get("/api/tenant-info/", HTTP_HOST=f"{shared_tenant.subdomain}.localhost:8000")
         
         assert response.status_code == 200
         data = response.json()
-        assert data["tenant_id"] == tenant.id
-        assert data["subdomain"] == "info"
+        assert data["tenant_id"] == shared_tenant.id
+        assert data["subdomain"] == shared_tenant.subdomain
 
-    def test_login_with_valid_credentials(self):
+    def test_login_with_valid_credentials(self, api_client):
         """POST /api/auth/login/ com credenciais válidas retorna tokens."""
         tenant = TenantFactory(subdomain="login")
         user = UserFactory(tenant=tenant, email="user@login.com")
         user.set_password("pass123")
         user.save()
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/auth/login/",
             {"email": "user@login.com", "password": "pass123"},
             format="json",
@@ -260,31 +231,23 @@ class TestViewsCoverage:
         assert "access" in response.data
         assert "refresh" in response.data
 
-    def test_checkout_appointment_not_prebooked_returns_400(self):
+    @pytest.mark.slow
+    def test_checkout_appointment_not_prebooked_returns_400(self, tenant, owner_client):
         """Checkout de appointment não PRE_BOOKED retorna 400."""
-        tenant = TenantFactory(subdomain="checkout2")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
         from tests.factories import AppointmentFactory
         apt = AppointmentFactory(tenant=tenant, status="CONFIRMED")
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+        response = owner_client.post(
             "/api/payments/checkout/",
             {"appointment_id": apt.id},
             format="json",
-            HTTP_HOST="checkout2.localhost:8000",
         )
         
         assert response.status_code == 400
 
 
-@pytest.mark.django_db
 class TestExceptionHandlerCoverage:
-    """Testes para cobrir exception_handler.py."""
+    """Testes para cobrir exception_handler.py (sem banco)."""
 
     def test_exception_handler_with_dict_detail(self):
         """Exception handler normaliza dict detail."""
@@ -7,9 +7,11 @@ import responses
 from decimal import Decimal
 from datetime import timedelta
 from django.utils import timezone
-from rest_framework.test import APIClient
-from core.context import set_current_tenant
+from rest_framework.test import APIRequestFactory
+from core.context import clear_current_tenant, set_current_tenant
 from core.models import Appointment, Payment
+from core.mp_client import MP_MAX_RETRIES
+from core.tasks import MP_TASK_MAX_RETRIES
 from tests.factories import (
     TenantFactory,
     UserFactory,
@@ -20,232 +22,214 @@ from tests.factories import (
     PaymentFactory,
 )
 
+# Relógio congelado em todo o módulo (frozen_now: 2025-01-15 12:00 UTC)
+pytestmark = pytest.mark.usefixtures("frozen_now")
+FUTURE_ISO = "2025-01-16T12:00:00+00:00"  # frozen_now + 24h
+
+PET_DETAIL = "/api/pets/{id}/".format
+CUSTOMER_DETAIL = "/api/customers/{id}/".format
+APPOINTMENT_DETAIL = "/api/appointments/{id}/".format
+
+# Contexto do exception handler: nenhum teste depende do request em si
+HANDLER_CONTEXT = {"request": APIRequestFactory().get("/")}
+
+
+def ref_id(ref, factory, tenant, **kwargs):
+    """
+    Id para os casos de referência inválida: "own" cria o objeto no tenant do
+    teste, "other_tenant" em um segundo tenant e "missing" é um id inexistente.
+    """
+    if ref == "missing":
+        return 99999
+    if ref == "other_tenant":
+        # Built inside the other tenant's context (Appointment.save() looks up
+        # the service through the tenant-scoped manager), then restored
+        other = TenantFactory()
+        set_current_tenant(other)
+        try:
+            return factory(tenant=other, **kwargs).id
+        finally:
+            set_current_tenant(tenant)
+    return factory(tenant=tenant, **kwargs).id
+
+
+@pytest.fixture(scope="class")
+def prebooked_appointment(shared_tenant, django_db_blocker):
+    """
+    PRE_BOOKED appointment shared by the class's tests that only read it.
+    Created outside the per-test transaction; deleted at class teardown.
+    """
+    with django_db_blocker.unblock():
+        # Runs before the per-test clear_tenant_context: save() looks up the
+        # service through the tenant-scoped manager
+        set_current_tenant(shared_tenant)
+        try:
+            apt = AppointmentFactory(tenant=shared_tenant, status="PRE_BOOKED")
+        finally:
+            clear_current_tenant()
+        yield apt
+        apt.delete()
+
 
 @pytest.mark.django_db
 class TestSerializersEdgeCases:
     """Edge cases para serializers não cobertos."""
 
-    def test_pet_update_wrong_tenant_customer(self):
+    def test_pet_update_wrong_tenant_customer(self, owner_client, pet):
         """Atualizar pet com customer de outro tenant retorna 400."""
-        tenant1 = TenantFactory(subdomain="pet1")
-        tenant2 = TenantFactory(subdomain="pet2")
-        user1 = UserFactory(tenant=tenant1)
-        
-        set_current_tenant(tenant1)
-        customer1 = CustomerFactory(tenant=tenant1)
-        pet1 = PetFactory(tenant=tenant1, customer=customer1)
-        
-        set_current_tenant(tenant2)
-        customer2 = CustomerFactory(tenant=tenant2)
+        other_customer = CustomerFactory(tenant=TenantFactory())
         
-        client = APIClient()
-        client.force_authenticate(user=user1)
-        
-        # Tentar atualizar pet1 com customer2 (outro tenant)
-        response = client.patch(
-            f"/api/pets/{pet1.id}/",
-            {"customer": customer2.id},
+        # Tentar atualizar o pet com customer de outro tenant
+        response = owner_client.patch(
+            PET_DETAIL(id=pet.id),
+            {"customer": other_customer.id},
             format="json",
-            HTTP_HOST="pet1.localhost:8000",
         )
         assert response.status_code == 400
 
-    def test_prebook_pet_not_found(self):
-        """Pre-book com pet inexistente retorna 400."""
-        tenant = TenantFactory(subdomain="pb1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        service = ServiceFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+    @pytest.mark.parametrize(
+        "pet_ref,service_ref",
+        [
+            pytest.param("missing", "own", id="pet_not_found"),
+            pytest.param("own", "missing", id="service_not_found"),
+            pytest.param("other_tenant", "own", id="pet_wrong_tenant"),
+        ],
+    )
+    def test_prebook_invalid_reference_returns_400(self, tenant, owner_client, pet_ref, service_ref):
+        """Pre-book com pet/service inexistente ou de outro tenant retorna 400."""
+        response = owner_client.post(
             "/api/appointments/pre-book/",
             {
-                "pet_id": 99999,
-                "service_id": service.id,
-                "scheduled_at": (timezone.now() + timedelta(hours=24)).isoformat(),
+                "pet_id": ref_id(pet_ref, PetFactory, tenant),
+                "service_id": ref_id(service_ref, ServiceFactory, tenant),
+                "scheduled_at": FUTURE_ISO,
             },
             format="json",
-            HTTP_HOST="pb1.localhost:8000",
         )
         assert response.status_code == 400
 
-    def test_prebook_service_not_found(self):
-        """Pre-book com service inexistente retorna 400."""
-        tenant = TenantFactory(subdomain="pb2")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        pet = PetFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
-            "/api/appointments/pre-book/",
-            {
-                "pet_id": pet.id,
-                "service_id": 99999,
-                "scheduled_at": (timezone.now() + timedelta(hours=24)).isoformat(),
-            },
+    @pytest.mark.parametrize(
+        "appointment_ref,message",
+        [
+            pytest.param("missing", "Appointment não encontrado", id="appointment_not_found"),
+            pytest.param("other_tenant", "Appointment pertence a outro tenant", id="appointment_wrong_tenant"),
+        ],
+    )
+    def test_checkout_invalid_appointment_returns_400(self, tenant, owner_client, appointment_ref, message):
+        """Checkout com appointment inexistente ou de outro tenant retorna 400."""
+        appointment_id = ref_id(appointment_ref, AppointmentFactory, tenant, status="PRE_BOOKED")
+        
+        response = owner_client.post(
+            "/api/payments/checkout/",
+            {"appointment_id": appointment_id},
             format="json",
-            HTTP_HOST="pb2.localhost:8000",
         )
         assert response.status_code == 400
+        assert message in response.data["error"]["message"]
+        assert not Payment.all_objects.filter(appointment_id=appointment_id).exists()
 
-    def test_prebook_pet_wrong_tenant(self):
-        """Pre-book com pet de outro tenant retorna 400."""
-        tenant1 = TenantFactory(subdomain="pb3")
-        tenant2 = TenantFactory(subdomain="pb4")
-        user1 = UserFactory(tenant=tenant1)
-        
-        set_current_tenant(tenant2)
-        pet2 = PetFactory(tenant=tenant2)
-        
-        set_current_tenant(tenant1)
-        service1 = ServiceFactory(tenant=tenant1)
-        
-        client = APIClient()
-        client.force_authenticate(user=user1)
+    def test_checkout_mercadopago_api_error_marks_payment_failed(self, mp_mock, tenant, owner_client):
+        """Checkout com erro no MP API: re-tenta e, esgotadas as tentativas, o Payment fica FAILED com o erro."""
+        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
         
-        response = client.post(
-            "/api/appointments/pre-book/",
-            {
-                "pet_id": pet2.id,
-                "service_id": service1.id,
-                "scheduled_at": (timezone.now() + timedelta(hours=24)).isoformat(),
-            },
-            format="json",
-            HTTP_HOST="pb3.localhost:8000",
+        # Mock MP API failure
+        mp_mock.add(
+            responses.POST,
+            "https://api.mercadopago.com/checkout/preferences",
+            json={"message": "API error"},
+            status=500,
         )
-        assert response.status_code == 400
-
-    def test_checkout_appointment_not_found(self):
-        """Checkout com appointment inexistente retorna 400."""
-        tenant = TenantFactory(subdomain="co1")
-        user = UserFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
         
-        response = client.post(
+        response = owner_client.post(
             "/api/payments/checkout/",
-            {"appointment_id": 99999},
+            {"appointment_id": apt.id},
             format="json",
-            HTTP_HOST="co1.localhost:8000",
         )
-        assert response.status_code == 400
+        assert response.status_code == 202
+        assert len(mp_mock.calls) == MP_TASK_MAX_RETRIES + 1
 
-    def test_checkout_appointment_wrong_tenant(self):
-        """Checkout com appointment de outro tenant retorna 400."""
-        tenant1 = TenantFactory(subdomain="co2")
-        tenant2 = TenantFactory(subdomain="co3")
-        user1 = UserFactory(tenant=tenant1)
-        
-        set_current_tenant(tenant2)
-        apt2 = AppointmentFactory(tenant=tenant2, status="PRE_BOOKED")
-        
-        client = APIClient()
-        client.force_authenticate(user=user1)
-        
-        response = client.post(
-            "/api/payments/checkout/",
-            {"appointment_id": apt2.id},
-            format="json",
-            HTTP_HOST="co2.localhost:8000",
-        )
-        assert response.status_code == 400
+        payment = Payment.all_objects.get(pk=response.json()["payment_id"])
+        assert payment.status == "FAILED"
+        assert payment.error_message == "API error"
 
-    @responses.activate
-    def test_checkout_mercadopago_api_error_returns_500(self):
-        """Checkout com erro no MP API retorna 500."""
-        tenant = TenantFactory(subdomain="co4")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
+        # O cliente que faz polling recebe o erro, não 404
+        detail = owner_client.get(f"/api/payments/{payment.pk}/")
+        assert detail.status_code == 200
+        assert detail.json()["status"] == "FAILED"
+        assert detail.json()["error_message"] == "API error"
+
+    def test_checkout_after_failed_preference_reuses_payment(self, mp_mock, tenant, owner_client):
+        """Novo checkout após falha reaproveita o Payment FAILED (OneToOne com o appointment)."""
         apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        
-        # Mock MP API failure
-        responses.add(
+        failed = PaymentFactory(
+            appointment=apt, tenant=tenant, status="FAILED",
+            payment_id_external=None, error_message="API error",
+        )
+        mp_mock.add(
             responses.POST,
             "https://api.mercadopago.com/checkout/preferences",
-            json={"error": "API error"},
-            status=500,
+            json={"id": "PREF-RETRY", "init_point": "https://mp.test/PREF-RETRY"},
+            status=201,
         )
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+
+        response = owner_client.post(
             "/api/payments/checkout/",
             {"appointment_id": apt.id},
             format="json",
-            HTTP_HOST="co4.localhost:8000",
         )
-        assert response.status_code == 500
-        assert "error" in response.data
+        assert response.status_code == 202
+        assert response.json()["payment_id"] == failed.pk
+
+        failed.refresh_from_db()
+        assert failed.status == "PENDING"
+        assert failed.error_message == ""
+        assert failed.payment_id_external == "PREF-RETRY"
 
 
-@pytest.mark.django_db
 class TestExceptionHandlerEdgeCases:
     """Edge cases para exception_handler."""
 
-    def test_exception_handler_with_empty_message(self):
-        """Exception handler trata mensagem vazia."""
-        from rest_framework.exceptions import ValidationError
-        from rest_framework.test import APIRequestFactory
-        from core.exception_handler import custom_exception_handler, _infer_code
-        
-        # _infer_code com string vazia
-        code = _infer_code("")
-        assert code == "VALIDATION_ERROR"
-        
-        # _infer_code com None
-        code = _infer_code(None)
-        assert code == "VALIDATION_ERROR"
-
-    def test_exception_handler_infer_code_variations(self):
-        """_infer_code mapeia várias mensagens corretamente."""
+    @pytest.mark.parametrize(
+        "message,code",
+        [
+            ("", "VALIDATION_ERROR"),
+            (None, "VALIDATION_ERROR"),
+            ("CPF inválido", "INVALID_CPF"),
+            ("cpf invalido", "INVALID_CPF"),  # sem acento
+            ("CPF já cadastrado", "CPF_DUPLICATE"),
+            ("Customer pertence a outro tenant", "CUSTOMER_WRONG_TENANT"),
+            ("Preço deve ser positivo", "INVALID_PRICE"),
+            ("Duração deve ser maior", "INVALID_DURATION"),
+            ("Horário já ocupado", "CONFLICT_SCHEDULE"),
+            ("conflito de horário", "CONFLICT_SCHEDULE"),
+            ("appointment deve estar PRE_BOOKED", "INVALID_STATUS"),
+            ("Mensagem aleatória", "VALIDATION_ERROR"),
+        ],
+    )
+    def test_exception_handler_infer_code(self, message, code):
+        """_infer_code mapeia a mensagem (inclusive vazia/None) para o código."""
         from core.exception_handler import _infer_code
         
-        assert _infer_code("CPF inválido") == "INVALID_CPF"
-        assert _infer_code("cpf invalido") == "INVALID_CPF"  # sem acento
-        assert _infer_code("CPF já cadastrado") == "CPF_DUPLICATE"
-        assert _infer_code("Customer pertence a outro tenant") == "CUSTOMER_WRONG_TENANT"
-        assert _infer_code("Preço deve ser positivo") == "INVALID_PRICE"
-        assert _infer_code("Duração deve ser maior") == "INVALID_DURATION"
-        assert _infer_code("Horário já ocupado") == "CONFLICT_SCHEDULE"
-        assert _infer_code("conflito de horário") == "CONFLICT_SCHEDULE"
-        assert _infer_code("appointment deve estar PRE_BOOKED") == "INVALID_STATUS"
-        assert _infer_code("Mensagem aleatória") == "VALIDATION_ERROR"
+        assert _infer_code(message) == code
 
     def test_integrity_error_cpf_duplicate_returns_400(self):
         """IntegrityError sem no_overlap retorna CPF_DUPLICATE."""
         from django.db import IntegrityError
-        from rest_framework.test import APIRequestFactory
         from core.exception_handler import custom_exception_handler
         
         exc = IntegrityError("DETAIL: Key (cpf, tenant_id) already exists")
-        request = APIRequestFactory().get("/")
-        context = {"request": request}
         
-        response = custom_exception_handler(exc, context)
+        response = custom_exception_handler(exc, HANDLER_CONTEXT)
         assert response.status_code == 400
         assert response.data["error"]["code"] == "CPF_DUPLICATE"
 
     def test_unhandled_exception_returns_500(self):
         """Exceção não tratada retorna 500 INTERNAL_ERROR."""
-        from rest_framework.test import APIRequestFactory
         from core.exception_handler import custom_exception_handler
         
         exc = RuntimeError("Something went wrong")
-        request = APIRequestFactory().get("/")
-        context = {"request": request}
         
-        response = custom_exception_handler(exc, context)
+        response = custom_exception_handler(exc, HANDLER_CONTEXT)
         assert response.status_code == 500
         assert response.data["error"]["code"] == "INTERNAL_ERROR"
 
@@ -254,39 +238,22 @@ class TestExceptionHandlerEdgeCases:
 class TestViewsEdgeCases:
     """Edge cases para views.py."""
 
-    def test_service_filter_is_active_false(self):
+    def test_service_filter_is_active_false(self, tenant, owner_client):
         """Filtrar services com is_active=false."""
-        tenant = TenantFactory(subdomain="svc1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
         ServiceFactory(tenant=tenant, is_active=True, name="Active")
         ServiceFactory(tenant=tenant, is_active=False, name="Inactive")
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.get(
-            "/api/services/?is_active=false",
-            HTTP_HOST="svc1.localhost:8000",
-        )
+        response = owner_client.get("/api/services/?is_active=false")
         assert response.status_code == 200
         assert len(response.data) == 1
         assert response.data[0]["name"] == "Inactive"
 
-    def test_appointment_update_via_put(self):
+    def test_appointment_update_via_put(self, tenant, owner_client):
         """PUT /appointments/{id}/ atualiza appointment."""
-        tenant = TenantFactory(subdomain="apt1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
         apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.put(
-            f"/api/appointments/{apt.id}/",
+        response = owner_client.put(
+            APPOINTMENT_DETAIL(id=apt.id),
             {
                 "pet": apt.pet.id,
                 "service": apt.service.id,
@@ -294,81 +261,53 @@ class TestViewsEdgeCases:
                 "status": "CONFIRMED",
             },
             format="json",
-            HTTP_HOST="apt1.localhost:8000",
         )
         assert response.status_code == 200
 
-    def test_delete_customer(self):
+    def test_delete_customer(self, owner_client, customer):
         """DELETE /customers/{id}/ remove customer."""
-        tenant = TenantFactory(subdomain="del1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        customer = CustomerFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.delete(
-            f"/api/customers/{customer.id}/",
-            HTTP_HOST="del1.localhost:8000",
-        )
+        response = owner_client.delete(CUSTOMER_DETAIL(id=customer.id))
         assert response.status_code == 204
 
-    def test_delete_appointment(self):
+    def test_delete_appointment(self, owner_client, appointment):
         """DELETE /appointments/{id}/ remove appointment."""
-        tenant = TenantFactory(subdomain="del2")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.delete(
-            f"/api/appointments/{apt.id}/",
-            HTTP_HOST="del2.localhost:8000",
-        )
+        response = owner_client.delete(APPOINTMENT_DETAIL(id=appointment.id))
         assert response.status_code == 204
 
-    @responses.activate
-    def test_webhook_mp_api_query_error(self):
-        """Webhook com erro ao consultar MP API retorna 500."""
-        tenant = TenantFactory(subdomain="wh1")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
+    def test_webhook_mp_api_query_error(self, mp_mock, api_client, tenant, prebooked_appointment):
+        """Erro ao consultar o MP: a task é re-tentada (o MP já recebeu 200 e não reenvia)."""
+        payment = PaymentFactory(
             tenant=tenant,
-            appointment=apt,
+            appointment=prebooked_appointment,
             amount=Decimal("50.00"),
-            status="PENDING",
             payment_id_external="MPERR",
         )
         
         # Mock MP API error
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MPERR",
             json={"error": "Internal error"},
             status=500,
         )
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MPERR"}},
             format="json",
         )
         
-        assert response.status_code == 500
-        assert "error" in response.data
-
-    def test_webhook_missing_payment_id(self):
+        assert response.status_code == 200
+        # Task eager: cada execução da task faz o GET com os retries HTTP da
+        # Session, e a task é re-tentada até esgotar as tentativas
+        assert len(mp_mock.calls) == (MP_MAX_RETRIES + 1) * (MP_TASK_MAX_RETRIES + 1)
+        payment.refresh_from_db()
+        assert payment.status == "PENDING"
+        assert payment.webhook_processed is False
+
+    def test_webhook_missing_payment_id(self, api_client):
         """Webhook sem payment ID retorna 400."""
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {}},  # Missing ID
             format="json",
@@ -377,51 +316,43 @@ class TestViewsEdgeCases:
         assert response.status_code == 400
         assert response.data["error"]["code"] == "MISSING_PAYMENT_ID"
 
-    @responses.activate
-    def test_webhook_pending_status_returns_pending(self):
-        """Webhook com status pending retorna pending."""
-        tenant = TenantFactory(subdomain="wh2")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
+    def test_webhook_pending_status_keeps_payment_pending(self, mp_mock, api_client, tenant, prebooked_appointment):
+        """Webhook com status não final mantém Payment PENDING."""
+        payment = PaymentFactory(
             tenant=tenant,
-            appointment=apt,
+            appointment=prebooked_appointment,
             amount=Decimal("50.00"),
-            status="PENDING",
             payment_id_external="MPPEND",
         )
         
         # Mock MP API pending
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MPPEND",
             json={"status": "in_process"},
             status=200,
         )
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MPPEND"}},
             format="json",
         )
         
         assert response.status_code == 200
-        assert response.data["payment_status"] == "in_process"
+        payment.refresh_from_db()
+        assert payment.status == "PENDING"
+        assert payment.webhook_processed is False
 
 
 @pytest.mark.django_db
 class TestServicesEdgeCases:
     """Edge cases para services.py."""
 
-    def test_calculate_refund_uses_approved_payment(self):
+    def test_calculate_refund_uses_approved_payment(self, tenant):
         """calculate_refund usa Payment APPROVED."""
         from core.services import CancellationService
         
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
         scheduled_at = timezone.now() + timedelta(hours=30)
         apt = AppointmentFactory(
             tenant=tenant,
@@ -430,7 +361,7 @@ class TestServicesEdgeCases:
         )
         
         # Payment APPROVED
-        Payment.all_objects.create(
+        PaymentFactory(
             tenant=tenant,
             appointment=apt,
             amount=Decimal("50.00"),
@@ -446,58 +377,50 @@ class TestServicesEdgeCases:
 class TestAuthenticationCoverage:
     """Testes de autenticação."""
 
-    def test_login_invalid_credentials_returns_401(self):
+    def test_login_invalid_credentials_returns_401(self, api_client, tenant):
         """Login com credenciais inválidas retorna 401."""
-        tenant = TenantFactory(subdomain="auth1")
         UserFactory(tenant=tenant, email="user@auth.com", password="correct123")
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/auth/login/",
             {"email": "user@auth.com", "password": "wrongpass"},
             format="json",
-            HTTP_HOST="auth1.localhost:8000",
+            HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
         
         assert response.status_code == 401
 
-    def test_refresh_token_returns_new_access_token(self):
+    def test_refresh_token_returns_new_access_token(self, api_client, tenant):
         """POST /api/auth/refresh/ retorna novo access token."""
-        tenant = TenantFactory(subdomain="auth2")
         user = UserFactory(tenant=tenant, email="user@auth2.com")
         user.set_password("pass123")
         user.save()
         
-        client = APIClient()
-        
         # Get tokens
-        login_response = client.post(
+        login_response = api_client.post(
             "/api/auth/login/",
             {"email": "user@auth2.com", "password": "pass123"},
             format="json",
-            HTTP_HOST="auth2.localhost:8000",
+            HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
         refresh_token = login_response.data["refresh"]
         
         # Refresh
-        response = client.post(
+        response = api_client.post(
             "/api/auth/refresh/",
             {"refresh": refresh_token},
             format="json",
-            HTTP_HOST="auth2.localhost:8000",
+            HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
         
         assert response.status_code == 200
         assert "access" in response.data
 
-    def test_unauthenticated_request_returns_401(self):
+    def test_unauthenticated_request_returns_401(self, api_client, tenant):
         """Request sem autenticação retorna 401."""
-        tenant = TenantFactory(subdomain="noauth")
-        
-        client = APIClient()
         # Sem force_authenticate
         
-        response = client.get("/api/customers/", HTTP_HOST="noauth.localhost:8000")
+        response = api_client.get("/api/customers/", HTTP_HOST=f"{tenant.subdomain}.localhost:8000")
         assert response.status_code == 401
 
 
@@ -505,62 +428,34 @@ class TestAuthenticationCoverage:
 class TestCRUDOperationsCoverage:
     """Testes de CRUD para cobrir views."""
 
-    def test_list_and_detail_operations(self):
+    @pytest.mark.parametrize(
+        "path",
+        [
+            pytest.param("/api/customers/", id="customer_list"),
+            pytest.param("/api/customers/{customer.id}/", id="customer_detail"),
+            pytest.param("/api/pets/", id="pet_list"),
+            pytest.param("/api/services/", id="service_list"),
+        ],
+    )
+    def test_list_and_detail_operations(self, owner_client, customer, pet, service, path):
         """GET list e detail de customers, pets, services."""
-        tenant = TenantFactory(subdomain="crud1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        customer = CustomerFactory(tenant=tenant)
-        pet = PetFactory(tenant=tenant, customer=customer)
-        service = ServiceFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        # List customers
-        r = client.get("/api/customers/", HTTP_HOST="crud1.localhost:8000")
+        r = owner_client.get(path.format(customer=customer))
         assert r.status_code == 200
-        assert len(r.data) >= 1
-        
-        # Detail customer
-        r = client.get(f"/api/customers/{customer.id}/", HTTP_HOST="crud1.localhost:8000")
-        assert r.status_code == 200
-        
-        # List pets
-        r = client.get("/api/pets/", HTTP_HOST="crud1.localhost:8000")
-        assert r.status_code == 200
-        
-        # List services
-        r = client.get("/api/services/", HTTP_HOST="crud1.localhost:8000")
-        assert r.status_code == 200
-
-    def test_update_operations(self):
-        """PUT/PATCH de customers, pets, services."""
-        tenant = TenantFactory(subdomain="upd1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
-        customer = CustomerFactory(tenant=tenant)
-        service = ServiceFactory(tenant=tenant)
-        
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        # Update customer
-        r = client.patch(
-            f"/api/customers/{customer.id}/",
-            {"name": "Updated Name"},
-            format="json",
-            HTTP_HOST="upd1.localhost:8000",
-        )
-        assert r.status_code == 200
-        
-        # Update service
-        r = client.patch(
-            f"/api/services/{service.id}/",
-            {"is_active": False},
+        if path.endswith("s/"):
+            assert len(r.data) >= 1
+
+    @pytest.mark.parametrize(
+        "path,payload",
+        [
+            pytest.param("/api/customers/{customer.id}/", {"name": "Updated Name"}, id="customer"),
+            pytest.param("/api/services/{service.id}/", {"is_active": False}, id="service"),
+        ],
+    )
+    def test_update_operations(self, owner_client, customer, service, path, payload):
+        """PATCH de customers e services."""
+        r = owner_client.patch(
+            path.format(customer=customer, service=service),
+            payload,
             format="json",
-            HTTP_HOST="upd1.localhost:8000",
         )
         assert r.status_code == 200
@@ -3,38 +3,74 @@ Testes de edge cases para exception handler, serializers, middleware e services.
 Cobre branches específicos, validações sem contexto, erros de formato e caminhos alternativos.
 """
 import pytest
-import json
 import responses
+from unittest.mock import patch
 from decimal import Decimal
 from datetime import timedelta
 from django.utils import timezone
 from django.test import RequestFactory
-from django.db import transaction
-from rest_framework.test import APIClient, APIRequestFactory
+from django.db import IntegrityError
+from rest_framework.test import APIRequestFactory
 from rest_framework.exceptions import ValidationError
-from core.context import set_current_tenant, get_current_tenant, clear_current_tenant
-from core.models import Pet, Service, Appointment, Payment
+from core.context import set_current_tenant, clear_current_tenant
+from core.models import Customer, Pet, Service, Appointment, Payment
 from core.exception_handler import custom_exception_handler, _normalize_message, _infer_code
-from core.exceptions import APIError, PaymentFailedError
+from core.exceptions import APIError, AppointmentConflictError, PaymentFailedError
 from core.serializers import (
     PetSerializer,
     ServiceSerializer,
     PreBookAppointmentSerializer,
     CheckoutSerializer,
 )
-from core.services import AppointmentService, CancellationService
+from core.services import AppointmentService, CancellationService, PaymentService
 from tests.factories import (
     TenantFactory,
     UserFactory,
     CustomerFactory,
     PetFactory,
     ServiceFactory,
-    AppointmentFactory,
     PaymentFactory,
+    make_apt_with_payment,
 )
 
 
-@pytest.mark.django_db
+@pytest.fixture(scope="module")
+def pet_serializer_no_ctx():
+    """PetSerializer sem request; validate_* não altera estado da instância."""
+    return PetSerializer(context={})
+
+
+@pytest.fixture(scope="module")
+def prebook_serializer_no_ctx():
+    """PreBookAppointmentSerializer sem request, compartilhado pelo módulo."""
+    return PreBookAppointmentSerializer(context={})
+
+
+@pytest.fixture(scope="module")
+def checkout_serializer_no_ctx():
+    """CheckoutSerializer sem request, compartilhado pelo módulo."""
+    return CheckoutSerializer(context={})
+
+
+@pytest.fixture
+def min_appointment(tenant, pet, service):
+    """
+    Appointment PRE_BOOKED mínimo para os testes de webhook, inserido via
+    bulk_create (end_time calculado aqui, sem o lookup de Service do save()).
+    """
+    scheduled_at = timezone.now() + timedelta(days=1)
+    apt = Appointment(
+        tenant=tenant,
+        pet=pet,
+        service=service,
+        scheduled_at=scheduled_at,
+        end_time=scheduled_at + timedelta(minutes=service.duration_minutes),
+        status="PRE_BOOKED",
+    )
+    Appointment.all_objects.bulk_create([apt])
+    return apt
+
+
 class TestExceptionHandlerComplete:
     """100% cobertura de exception_handler.py."""
 
@@ -58,6 +94,16 @@ class TestExceptionHandlerComplete:
         assert response.status_code == 400
         assert response.data["error"]["code"] == "PAYMENT_FAILED"
 
+    def test_object_does_not_exist_is_not_mapped_to_404(self):
+        """ObjectDoesNotExist não tratado pela view é bug: 500 INTERNAL_ERROR, não 404."""
+        exc = Appointment.DoesNotExist("gone")
+        request = APIRequestFactory().get("/")
+        context = {"request": request}
+        
+        response = custom_exception_handler(exc, context)
+        assert response.status_code == 500
+        assert response.data["error"]["code"] == "INTERNAL_ERROR"
+
     def test_integrity_error_with_exclusion_keyword(self):
         """IntegrityError com 'exclusion' retorna CONFLICT_SCHEDULE (linha 105)."""
         from django.db import IntegrityError
@@ -75,21 +121,27 @@ class TestExceptionHandlerComplete:
 class TestMiddlewareComplete:
     """100% cobertura de middleware.py."""
 
-    def test_middleware_with_localhost_host(self):
-        """Middleware com host localhost usa subdomain 'localhost' (linha 23)."""
+    @pytest.mark.parametrize("host", ["localhost:8000", "127.0.0.1:8000"])
+    def test_middleware_with_localhost_host(self, host):
+        """Middleware com host localhost/127.0.0.1 resolve o tenant de subdomain 'localhost'."""
         from core.middleware import TenantMiddleware
         
-        TenantFactory(subdomain="localhost")
+        localhost = TenantFactory(subdomain="localhost")
+        middleware = TenantMiddleware(lambda r: r.tenant)
+        request = RequestFactory().get("/", HTTP_HOST=host)
         
-        middleware = TenantMiddleware(lambda r: None)
-        factory = RequestFactory()
-        request = factory.get("/", HTTP_HOST="localhost:8000")
+        assert middleware(request) == localhost
+
+    def test_middleware_with_localhost_host_without_tenant_returns_404(self):
+        """Sem tenant 'localhost' cadastrado, localhost responde 404 TENANT_NOT_FOUND."""
+        from core.middleware import TenantMiddleware
+        
+        middleware = TenantMiddleware(lambda r: r.tenant)
+        request = RequestFactory().get("/", HTTP_HOST="localhost:8000")
         
-        # Middleware deve processar sem erro
-        try:
-            middleware(request)
-        except Exception:
-            pass  # OK se tenant não existir, só queremos exercitar linha 23
+        response = middleware(request)
+        assert response.status_code == 404
+        assert b"TENANT_NOT_FOUND" in response.content
 
 
 @pytest.mark.django_db
@@ -112,24 +164,21 @@ class TestModelsComplete:
 class TestPermissionsComplete:
     """100% cobertura de permissions.py."""
 
-    def test_permission_with_superuser(self):
+    def test_permission_with_superuser(self, api_client, tenant):
         """Permissions com superuser (linhas 8-9)."""
-        tenant = TenantFactory(subdomain="perm1")
-        set_current_tenant(tenant)
         superuser = UserFactory(tenant=tenant, is_superuser=True, role="ATTENDANT")
         
-        client = APIClient()
-        client.force_authenticate(user=superuser)
+        api_client.force_authenticate(user=superuser)
         
         # IsOwner permite superuser
-        response = client.get(
+        response = api_client.get(
             "/api/customers/",
             HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
         assert response.status_code == 200  # Superuser tem acesso
         
         # IsOwnerOrAttendant também permite
-        response = client.get(
+        response = api_client.get(
             "/api/services/",
             HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
@@ -140,34 +189,24 @@ class TestPermissionsComplete:
 class TestSerializersComplete:
     """100% cobertura de serializers.py."""
 
-    def test_pet_serializer_validate_customer_without_request_context(self):
-        """PetSerializer.validate_customer sem request (linha 87)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        customer = CustomerFactory(tenant=tenant)
-        
-        serializer = PetSerializer(context={})  # Sem request
-        result = serializer.validate_customer(customer)
-        assert result == customer
-
-    def test_pet_serializer_validate_customer_without_tenant_attribute(self):
-        """PetSerializer.validate_customer com request sem tenant (linha 87)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        customer = CustomerFactory(tenant=tenant)
-        
-        factory = RequestFactory()
-        request = factory.get("/")
-        # request sem atributo tenant
-        
-        serializer = PetSerializer(context={"request": request})
-        result = serializer.validate_customer(customer)
-        assert result == customer
-
-    def test_pet_serializer_customer_wrong_tenant_raises_error(self):
+    @pytest.mark.parametrize("with_request", [False, True], ids=["sem_request", "request_sem_tenant"])
+    def test_pet_serializer_validate_customer_passthrough(
+        self, tenant, with_request, pet_serializer_no_ctx, django_assert_num_queries
+    ):
+        """PetSerializer.validate_customer sem request ou sem request.tenant devolve o valor (linha 87)."""
+        customer = Customer(tenant=tenant, name="Passthrough")  # não salvo
+        if with_request:
+            serializer = PetSerializer(context={"request": RequestFactory().get("/")})
+        else:
+            serializer = pet_serializer_no_ctx
+        
+        with django_assert_num_queries(0):
+            result = serializer.validate_customer(customer)
+        assert result is customer
+
+    def test_pet_serializer_customer_wrong_tenant_raises_error(self, two_tenants):
         """PetSerializer com customer de outro tenant (linha 91)."""
-        tenant1 = TenantFactory()
-        tenant2 = TenantFactory()
+        tenant1, tenant2 = two_tenants
         
         set_current_tenant(tenant2)
         customer = CustomerFactory(tenant=tenant2)
@@ -181,10 +220,8 @@ class TestSerializersComplete:
         with pytest.raises(ValidationError, match="outro tenant"):
             serializer.validate_customer(customer)
 
-    def test_pet_serializer_create_method(self):
+    def test_pet_serializer_create_method(self, tenant):
         """PetSerializer.create() (linha 95)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
         customer = CustomerFactory(tenant=tenant)
         
         factory = RequestFactory()
@@ -201,10 +238,8 @@ class TestSerializersComplete:
         assert pet.tenant == tenant
         assert pet.name == "Dog"
 
-    def test_pet_serializer_update_removes_tenant(self):
+    def test_pet_serializer_update_removes_tenant(self, tenant):
         """PetSerializer.update() remove tenant de validated_data (linha 99)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
         pet = PetFactory(tenant=tenant)
         
         serializer = PetSerializer(pet, context={})
@@ -212,11 +247,8 @@ class TestSerializersComplete:
         
         assert updated.name == "Updated"
 
-    def test_service_serializer_create_method(self):
+    def test_service_serializer_create_method(self, tenant):
         """ServiceSerializer.create() (linha 122)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
         factory = RequestFactory()
         request = factory.get("/")
         request.tenant = tenant
@@ -231,10 +263,8 @@ class TestSerializersComplete:
         assert service.tenant == tenant
         assert service.name == "Banho"
 
-    def test_service_serializer_update_removes_tenant(self):
+    def test_service_serializer_update_removes_tenant(self, tenant):
         """ServiceSerializer.update() remove tenant (linha 126)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
         service = ServiceFactory(tenant=tenant)
         
         serializer = ServiceSerializer(service, context={})
@@ -242,16 +272,17 @@ class TestSerializersComplete:
         
         assert updated.name == "Updated"
 
-    def test_prebook_validate_pet_without_request(self):
-        """PreBookAppointmentSerializer.validate_pet_id sem request (linha 139)."""
-        serializer = PreBookAppointmentSerializer(context={})
-        result = serializer.validate_pet_id(123)
-        assert result == 123
+    @pytest.mark.parametrize(
+        "method,value",
+        [("validate_pet_id", 123), ("validate_service_id", 456)],
+    )
+    def test_prebook_validate_id_without_request(self, prebook_serializer_no_ctx, method, value):
+        """PreBookAppointmentSerializer.validate_pet_id/validate_service_id sem request (linhas 139, 152)."""
+        assert getattr(prebook_serializer_no_ctx, method)(value) == value
 
-    def test_prebook_validate_pet_wrong_tenant(self):
+    def test_prebook_validate_pet_wrong_tenant(self, two_tenants):
         """PreBookAppointmentSerializer.validate_pet_id outro tenant (linha 146)."""
-        tenant1 = TenantFactory()
-        tenant2 = TenantFactory()
+        tenant1, tenant2 = two_tenants
         
         set_current_tenant(tenant2)
         pet = PetFactory(tenant=tenant2)
@@ -265,16 +296,9 @@ class TestSerializersComplete:
         with pytest.raises(ValidationError, match="outro tenant"):
             serializer.validate_pet_id(pet.id)
 
-    def test_prebook_validate_service_without_request(self):
-        """PreBookAppointmentSerializer.validate_service_id sem request (linha 152)."""
-        serializer = PreBookAppointmentSerializer(context={})
-        result = serializer.validate_service_id(456)
-        assert result == 456
-
-    def test_prebook_validate_service_wrong_tenant(self):
+    def test_prebook_validate_service_wrong_tenant(self, two_tenants):
         """PreBookAppointmentSerializer.validate_service_id outro tenant (linha 159)."""
-        tenant1 = TenantFactory()
-        tenant2 = TenantFactory()
+        tenant1, tenant2 = two_tenants
         
         set_current_tenant(tenant2)
         service = ServiceFactory(tenant=tenant2)
@@ -288,27 +312,37 @@ class TestSerializersComplete:
         with pytest.raises(ValidationError, match="outro tenant"):
             serializer.validate_service_id(service.id)
 
-    def test_prebook_validate_without_request_context(self):
-        """PreBookAppointmentSerializer.validate() sem request (linha 166)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
+    @pytest.mark.parametrize(
+        "db_error,expected",
+        [
+            pytest.param(
+                'conflicting key value violates exclusion constraint "no_overlap"',
+                AppointmentConflictError,
+                id="no_overlap",
+            ),
+            pytest.param("violates foreign key constraint", IntegrityError, id="other"),
+        ],
+    )
+    def test_prebook_create_maps_integrity_error(self, tenant, db_error, expected):
+        """PreBookAppointmentSerializer.create(): IntegrityError do no_overlap vira AppointmentConflictError; outros propagam."""
         pet = PetFactory(tenant=tenant)
         service = ServiceFactory(tenant=tenant)
-        
-        serializer = PreBookAppointmentSerializer(context={})
-        attrs = {
+        request = RequestFactory().post("/")
+        request.tenant = tenant
+        serializer = PreBookAppointmentSerializer(context={"request": request})
+        validated_data = {
             "pet_id": pet.id,
             "service_id": service.id,
             "scheduled_at": timezone.now() + timedelta(hours=24),
         }
-        
-        result = serializer.validate(attrs)
-        assert result == attrs
 
-    def test_checkout_validate_appointment_without_request(self):
+        with patch.object(Appointment.objects, "create", side_effect=IntegrityError(db_error)):
+            with pytest.raises(expected):
+                serializer.create(validated_data)
+
+    def test_checkout_validate_appointment_without_request(self, checkout_serializer_no_ctx):
         """CheckoutSerializer.validate_appointment_id sem request (linha 205)."""
-        serializer = CheckoutSerializer(context={})
-        result = serializer.validate_appointment_id(789)
+        result = checkout_serializer_no_ctx.validate_appointment_id(789)
         assert result == 789
 
 
@@ -324,45 +358,35 @@ class TestServicesComplete:
         # Transição inválida
         assert AppointmentService.can_transition("NO_SHOW", "CONFIRMED") is False
 
-    def test_cancellation_service_with_non_approved_payment(self):
+    def test_cancellation_service_with_non_approved_payment(self, tenant):
         """calculate_refund com payment não APPROVED retorna 0 (linha 112)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="CONFIRMED")
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("100.00"),
-            status="PENDING",  # Não APPROVED
+        apt = make_apt_with_payment(
+            tenant, timedelta(hours=24), Decimal("100.00"), payment_status="PENDING"  # Não APPROVED
         )
         
         refund = CancellationService.calculate_refund(apt)
         assert refund == Decimal("0")
 
-    def test_cancellation_service_with_naive_scheduled_at(self):
+    def test_cancellation_service_with_naive_scheduled_at(self, tenant):
         """calculate_refund com scheduled_at naive (sem tzinfo) (linha 119)."""
         from datetime import datetime
         from core.services import CancellationService
         
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
-        # Criar appointment com scheduled_at naive (sem timezone)
+        # Criar appointment com scheduled_at naive (sem timezone); bulk_create
+        # não passa por save(), então end_time é calculado aqui
         naive_datetime = datetime.now() + timedelta(hours=30)
-        apt = Appointment.all_objects.create(
+        service = ServiceFactory(tenant=tenant)
+        apt = Appointment(
             tenant=tenant,
             pet=PetFactory(tenant=tenant),
-            service=ServiceFactory(tenant=tenant),
+            service=service,
             scheduled_at=naive_datetime,  # naive datetime
+            end_time=naive_datetime + timedelta(minutes=service.duration_minutes),
             status="CONFIRMED",
         )
-        
-        Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("100.00"),
-            status="APPROVED",
+        Appointment.all_objects.bulk_create([apt])
+        Payment.all_objects.bulk_create(
+            [Payment(tenant=tenant, appointment=apt, amount=Decimal("100.00"), status="APPROVED")]
         )
         
         refund = CancellationService.calculate_refund(apt)
@@ -374,115 +398,65 @@ class TestServicesComplete:
 class TestViewsWebhookComplete:
     """100% cobertura de views.py (webhook paths)."""
 
-    @responses.activate
-    def test_webhook_empty_mp_response_returns_500(self):
-        """Webhook com response vazio do MP API (linha 346)."""
-        tenant = TenantFactory(subdomain="whe1")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
+    def test_webhook_empty_mp_response_raises_for_retry(self, mp_mock, tenant, min_appointment):
+        """Response vazio do MP: process_notification levanta (a task re-tenta) e não processa o Payment."""
         payment = Payment.all_objects.create(
             tenant=tenant,
-            appointment=apt,
+            appointment=min_appointment,
             amount=Decimal("50.00"),
             status="PENDING",
             payment_id_external="MPEMPTY",
         )
         
         # Mock MP API com response vazio
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MPEMPTY",
             json={},  # Response vazio (sem "response" key)
             status=200,
         )
         
-        client = APIClient()
-        response = client.post(
-            "/api/webhooks/mercadopago/",
-            {"type": "payment", "data": {"id": "MPEMPTY"}},
-            format="json",
-        )
-        
-        assert response.status_code == 500
-        assert "Empty response" in str(response.data)
-
-    @responses.activate
-    def test_webhook_approved_already_processed_in_transaction(self):
-        """Webhook approved já processado dentro de transaction (linhas 367-371)."""
-        tenant = TenantFactory(subdomain="whe2")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        # Payment JÁ processado
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="APPROVED",
-            payment_id_external="MPALREADY",
-            webhook_processed=True,  # JÁ PROCESSADO
-        )
-        
-        # Mock MP API
-        responses.add(
-            responses.GET,
-            "https://api.mercadopago.com/v1/payments/MPALREADY",
-            json={"status": "approved"},
-            status=200,
-        )
-        
-        client = APIClient()
-        response = client.post(
-            "/api/webhooks/mercadopago/",
-            {"type": "payment", "data": {"id": "MPALREADY"}},
-            format="json",
-        )
-        
-        assert response.status_code == 200
-        assert response.data["status"] == "already_processed"
-
-    @responses.activate
-    def test_webhook_rejected_already_processed_in_transaction(self):
-        """Webhook rejected já processado dentro de transaction (linhas 400-404)."""
-        tenant = TenantFactory(subdomain="whe3")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
+        with pytest.raises(PaymentFailedError):
+            PaymentService.process_notification(payment.id, "MPEMPTY")
+        
+        payment.refresh_from_db()
+        assert payment.webhook_processed is False
+
+    @pytest.mark.parametrize(
+        "status,external_id",
+        [
+            pytest.param("APPROVED", "MPALREADY", id="approved"),
+            pytest.param("REJECTED", "MPREJECTED2", id="rejected"),
+        ],
+    )
+    def test_webhook_already_processed_skips_mp_call(
+        self, mp_mock, api_client, tenant, min_appointment, status, external_id
+    ):
+        """Webhook de payment approved/rejected já processado responde already_processed sem consultar o MP."""
         # Payment JÁ processado
-        payment = Payment.all_objects.create(
+        Payment.all_objects.create(
             tenant=tenant,
-            appointment=apt,
+            appointment=min_appointment,
             amount=Decimal("50.00"),
-            status="REJECTED",
-            payment_id_external="MPREJECTED2",
+            status=status,
+            payment_id_external=external_id,
             webhook_processed=True,  # JÁ PROCESSADO
         )
         
-        # Mock MP API
-        responses.add(
-            responses.GET,
-            "https://api.mercadopago.com/v1/payments/MPREJECTED2",
-            json={"status": "rejected"},
-            status=200,
-        )
-        
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
-            {"type": "payment", "data": {"id": "MPREJECTED2"}},
+            {"type": "payment", "data": {"id": external_id}},
             format="json",
         )
         
         assert response.status_code == 200
-        assert response.data["status"] == "already_processed"
+        assert response.json()["status"] == "already_processed"
+        assert len(mp_mock.calls) == 0
 
-    def test_webhook_generic_exception_handling(self):
+    def test_webhook_generic_exception_handling(self, api_client):
         """Webhook com exceção genérica (linhas 438-440)."""
-        client = APIClient()
-        
         # POST inválido que causa exceção
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             "invalid json",  # Não é JSON válido
             content_type="application/json",
@@ -492,23 +466,14 @@ class TestViewsWebhookComplete:
         assert "error" in response.data
 
 
-@pytest.mark.django_db
 class TestInferCodeEdgeCases:
     """Testes adicionais para _infer_code para cobertura completa."""
 
-    def test_infer_code_with_none(self):
-        """_infer_code com None retorna VALIDATION_ERROR."""
-        code = _infer_code(None)
-        assert code == "VALIDATION_ERROR"
-
-    def test_infer_code_with_empty_string(self):
-        """_infer_code com string vazia retorna VALIDATION_ERROR."""
-        code = _infer_code("")
-        assert code == "VALIDATION_ERROR"
-
-    def test_infer_code_all_mappings(self):
-        """_infer_code testa todos os mapeamentos."""
-        mappings = [
+    @pytest.mark.parametrize(
+        "message,expected_code",
+        [
+            (None, "VALIDATION_ERROR"),
+            ("", "VALIDATION_ERROR"),
             ("CPF inválido", "INVALID_CPF"),
             ("cpf invalido", "INVALID_CPF"),
             ("CPF já cadastrado", "CPF_DUPLICATE"),
@@ -519,41 +484,37 @@ class TestInferCodeEdgeCases:
             ("conflito de horário", "CONFLICT_SCHEDULE"),
             ("appointment deve estar PRE_BOOKED", "INVALID_STATUS"),
             ("Unknown message", "VALIDATION_ERROR"),
-        ]
-        
-        for message, expected_code in mappings:
-            result = _infer_code(message)
-            assert result == expected_code, f"Expected {expected_code} for '{message}', got {result}"
+        ],
+    )
+    def test_infer_code_mapping(self, message, expected_code):
+        """_infer_code mapeia cada mensagem (inclusive None/vazia) para o código."""
+        assert _infer_code(message) == expected_code
 
 
-@pytest.mark.django_db
 class TestNormalizeMessageEdgeCases:
     """Testes para _normalize_message cobertura completa."""
 
-    def test_normalize_dict_with_non_field_errors(self):
-        """_normalize_message com dict contendo non_field_errors."""
-        detail = {
-            "non_field_errors": ["Error 1", "Error 2"],
-            "field1": "Field error",
-        }
+    @pytest.mark.parametrize(
+        "detail,accepted",
+        [
+            pytest.param(
+                {"non_field_errors": ["Error 1", "Error 2"], "field1": "Field error"},
+                ("Error 1", "Field error"),
+                id="dict_with_non_field_errors",
+            ),
+            pytest.param(
+                [{"field1": "Error 1"}, {"field2": "Error 2"}],
+                ("field1", "Error 1"),
+                id="nested_list_of_dicts",
+            ),
+        ],
+    )
+    def test_normalize_collection_detail(self, detail, accepted):
+        """_normalize_message com dict/lista inclui uma das mensagens."""
         result = _normalize_message(detail)
-        assert "Error 1" in result or "Field error" in result
-
-    def test_normalize_nested_list_of_dicts(self):
-        """_normalize_message com lista de dicts."""
-        detail = [
-            {"field1": "Error 1"},
-            {"field2": "Error 2"},
-        ]
-        result = _normalize_message(detail)
-        assert "field1" in result or "Error 1" in result
-
-    def test_normalize_empty_dict(self):
-        """_normalize_message com dict vazio."""
-        result = _normalize_message({})
-        assert result == ""
+        assert any(text in result for text in accepted)
 
-    def test_normalize_empty_list(self):
-        """_normalize_message com lista vazia."""
-        result = _normalize_message([])
-        assert result == ""
+    @pytest.mark.parametrize("detail", [{}, []], ids=["empty_dict", "empty_list"])
+    def test_normalize_empty_detail(self, detail):
+        """_normalize_message com dict/lista vazia retorna string vazia."""
+        assert _normalize_message(detail) == ""
@@ -7,23 +7,30 @@ Slots expirados ficam disponíveis para novos bookings.
 """
 import pytest
 from datetime import timedelta
-from django.core.management import call_command
 from django.utils import timezone
 from io import StringIO
-from core.context import set_current_tenant
+from core.management.commands.expire_prebookings import Command as ExpirePrebookings
 from core.models import Appointment
-from tests.factories import TenantFactory, AppointmentFactory
+from tests.factories import AppointmentFactory, PetFactory, ServiceFactory
+
+
+@pytest.fixture(scope="module")
+def pet_and_service(shared_tenant, django_db_blocker):
+    """
+    Pet e service (60 min) do tenant compartilhado, criados uma vez por módulo;
+    saem junto com o tenant no teardown. Testes gravam appointments via
+    bulk_create, então end_time = scheduled_at + 1h é montado no teste.
+    """
+    with django_db_blocker.unblock():
+        return PetFactory(tenant=shared_tenant), ServiceFactory(tenant=shared_tenant, duration_minutes=60)
 
 
 @pytest.mark.django_db
 class TestPreBookingExpiration:
     """RN05: PRE_BOOKED appointment expiration."""
 
-    def test_prebook_appointment_has_expires_at(self):
+    def test_prebook_appointment_has_expires_at(self, tenant):
         """Appointment PRE_BOOKED tem expires_at calculado automaticamente (default: now + 10min)."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
         # scheduled_at no futuro
         scheduled_at = timezone.now() + timedelta(hours=24)
         apt = AppointmentFactory(
@@ -39,44 +46,46 @@ class TestPreBookingExpiration:
         now = timezone.now()
         assert now <= apt.expires_at <= scheduled_at
 
-    def test_expire_prebookings_command_marks_expired(self):
+    def test_expire_prebookings_command_marks_expired(self, tenant, pet_and_service):
         """expire_prebookings marca PRE_BOOKED com expires_at < now como EXPIRED."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
-        # Appointment que já expirou
-        past = timezone.now() - timedelta(minutes=15)
-        apt_expired = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=timezone.now() + timedelta(hours=1),
-            status="PRE_BOOKED",
-            expires_at=past,
-        )
-        
-        # Appointment que ainda não expirou
-        future = timezone.now() + timedelta(hours=1)
-        apt_valid = AppointmentFactory(
-            tenant=tenant,
-            scheduled_at=timezone.now() + timedelta(hours=2),
-            status="PRE_BOOKED",
-            expires_at=future,
-        )
+        pet, service = pet_and_service
+        now = timezone.now()
+        apt_expired, apt_valid = Appointment.all_objects.bulk_create([
+            # Appointment que já expirou
+            Appointment(
+                tenant=tenant,
+                pet=pet,
+                service=service,
+                scheduled_at=now + timedelta(hours=1),
+                end_time=now + timedelta(hours=2),
+                status="PRE_BOOKED",
+                expires_at=now - timedelta(minutes=15),
+            ),
+            # Appointment que ainda não expirou
+            Appointment(
+                tenant=tenant,
+                pet=pet,
+                service=service,
+                scheduled_at=now + timedelta(hours=2),
+                end_time=now + timedelta(hours=3),
+                status="PRE_BOOKED",
+                expires_at=now + timedelta(hours=1),
+            ),
+        ])
         
         out = StringIO()
-        call_command("expire_prebookings", stdout=out)
+        ExpirePrebookings(stdout=out).handle()
         
-        apt_expired.refresh_from_db()
-        apt_valid.refresh_from_db()
+        status_by_id = dict(
+            Appointment.all_objects.filter(id__in=[apt_expired.id, apt_valid.id]).values_list("id", "status")
+        )
         
-        assert apt_expired.status == "EXPIRED"
-        assert apt_valid.status == "PRE_BOOKED"
+        assert status_by_id[apt_expired.id] == "EXPIRED"
+        assert status_by_id[apt_valid.id] == "PRE_BOOKED"
         assert "1" in out.getvalue() or "expired" in out.getvalue().lower()
 
-    def test_expired_appointment_frees_slot(self):
+    def test_expired_appointment_frees_slot(self, tenant):
         """Appointment EXPIRED libera o slot para novo booking."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
         scheduled_at = timezone.now() + timedelta(hours=24)
         apt = AppointmentFactory(
             tenant=tenant,
@@ -93,11 +102,8 @@ class TestPreBookingExpiration:
         
         assert Appointment.all_objects.filter(tenant=tenant).count() == 2
 
-    def test_edge_case_expires_exactly_now(self):
+    def test_edge_case_expires_exactly_now(self, tenant):
         """Appointment que expira exatamente agora deve ser marcado como EXPIRED."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
         # expires_at = now
         now = timezone.now()
         apt = AppointmentFactory(
@@ -107,16 +113,13 @@ class TestPreBookingExpiration:
             expires_at=now,
         )
         
-        call_command("expire_prebookings")
+        ExpirePrebookings().handle()
         
         apt.refresh_from_db()
         assert apt.status == "EXPIRED"
 
-    def test_confirmed_appointments_are_not_expired(self):
+    def test_confirmed_appointments_are_not_expired(self, tenant):
         """Appointments CONFIRMED não são expirados pelo command."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
         past = timezone.now() - timedelta(minutes=30)
         apt_confirmed = AppointmentFactory(
             tenant=tenant,
@@ -125,7 +128,7 @@ class TestPreBookingExpiration:
             expires_at=past,
         )
         
-        call_command("expire_prebookings")
+        ExpirePrebookings().handle()
         
         apt_confirmed.refresh_from_db()
         assert apt_confirmed.status == "CONFIRMED"  # Não mudou
@@ -4,11 +4,15 @@ RN01: Isolamento Multi-Tenancy via Thread-Local
 Testa que dados de um tenant não são visíveis para outro tenant.
 Thread-local context garante isolamento em requests concorrentes.
 """
+import json
+
 import pytest
 from django.test import RequestFactory, TestCase
+from rest_framework.exceptions import ValidationError
 from core.context import clear_current_tenant, get_current_tenant, set_current_tenant
 from core.middleware import TenantMiddleware
-from core.models import Customer, Pet, Service, Appointment
+from core.models import Customer, Pet, Service, Appointment, Tenant
+from core.serializers import PetSerializer
 from tests.factories import (
     TenantFactory,
     CustomerFactory,
@@ -22,10 +26,9 @@ from tests.factories import (
 class TestMultiTenancyIsolation:
     """RN01: Multi-tenancy isolation through thread-local context."""
 
-    def test_tenant_aware_manager_filters_by_current_tenant(self):
+    def test_tenant_aware_manager_filters_by_current_tenant(self, two_tenants):
         """Manager.objects retorna apenas dados do tenant atual."""
-        tenant1 = TenantFactory(subdomain="tenant1")
-        tenant2 = TenantFactory(subdomain="tenant2")
+        tenant1, tenant2 = two_tenants
 
         set_current_tenant(tenant1)
         customer1 = CustomerFactory(tenant=tenant1, name="Customer 1")
@@ -43,10 +46,9 @@ class TestMultiTenancyIsolation:
         assert Customer.objects.count() == 1
         assert Customer.objects.first().id == customer2.id
 
-    def test_all_objects_manager_bypasses_tenant_filter(self):
+    def test_all_objects_manager_bypasses_tenant_filter(self, two_tenants):
         """all_objects manager ignora filtro de tenant."""
-        tenant1 = TenantFactory(subdomain="t1")
-        tenant2 = TenantFactory(subdomain="t2")
+        tenant1, tenant2 = two_tenants
 
         set_current_tenant(tenant1)
         CustomerFactory(tenant=tenant1)
@@ -82,15 +84,40 @@ class TestMultiTenancyIsolation:
         response = middleware(request)
         
         assert response.status_code == 404
-        # JsonResponse não tem .json(), usar indexação direta
-        import json
+        # JsonResponse direto do middleware (sem test client): parse do content
         data = json.loads(response.content)
         assert data["error"]["code"] == "TENANT_NOT_FOUND"
 
-    def test_tenant_context_isolation_in_nested_operations(self):
+    @pytest.mark.parametrize(
+        "bulk_write",
+        [
+            pytest.param(lambda qs: qs.update(is_active=False), id="update"),
+            pytest.param(
+                lambda qs: qs.bulk_update([Tenant(pk=qs.get().pk, is_active=False)], ["is_active"]),
+                id="bulk_update",
+            ),
+            pytest.param(lambda qs: qs.delete(), id="delete"),
+        ],
+    )
+    def test_tenant_middleware_drops_cached_tenant_on_bulk_write(self, bulk_write):
+        """Escritas em lote não disparam post_save: o cache do subdomain é limpo mesmo assim."""
+        tenant = TenantFactory(subdomain="bulkco", is_active=True)
+        middleware = TenantMiddleware(lambda r: None)
+        factory = RequestFactory()
+        
+        # Primeiro request popula o cache
+        request = factory.get("/api/customers/", HTTP_HOST="bulkco.localhost:8000")
+        middleware(request)
+        assert request.tenant == tenant
+        
+        bulk_write(Tenant.objects.filter(pk=tenant.pk))
+        
+        response = middleware(factory.get("/api/customers/", HTTP_HOST="bulkco.localhost:8000"))
+        assert response.status_code == 404
+
+    def test_tenant_context_isolation_in_nested_operations(self, two_tenants, django_assert_num_queries):
         """Tenant context permanece consistente em operações aninhadas."""
-        tenant1 = TenantFactory(subdomain="t1")
-        tenant2 = TenantFactory(subdomain="t2")
+        tenant1, tenant2 = two_tenants
 
         set_current_tenant(tenant1)
         customer1 = CustomerFactory(tenant=tenant1)
@@ -102,29 +129,35 @@ class TestMultiTenancyIsolation:
         customer2 = CustomerFactory(tenant=tenant2)
         pet2 = PetFactory(tenant=tenant2, customer=customer2)
 
-        # Tenant 1 context: vê apenas seus dados
+        # Tenant 1 context: vê apenas seus dados (um COUNT por model, sem N+1)
         set_current_tenant(tenant1)
-        assert Customer.objects.count() == 1
-        assert Pet.objects.count() == 1
-        assert Service.objects.count() == 1
-        assert Appointment.objects.count() == 1
+        with django_assert_num_queries(4):
+            assert Customer.objects.count() == 1
+            assert Pet.objects.count() == 1
+            assert Service.objects.count() == 1
+            assert Appointment.objects.count() == 1
 
         # Tenant 2 context: vê apenas seus dados
         set_current_tenant(tenant2)
-        assert Customer.objects.count() == 1
-        assert Pet.objects.count() == 1
-        assert Service.objects.count() == 0  # service1 não é visível
-        assert Appointment.objects.count() == 0  # appointment1 não é visível
+        with django_assert_num_queries(4):
+            assert Customer.objects.count() == 1
+            assert Pet.objects.count() == 1
+            assert Service.objects.count() == 0  # service1 não é visível
+            assert Appointment.objects.count() == 0  # appointment1 não é visível
 
-    def test_cross_tenant_relationships_are_prevented(self):
+    def test_cross_tenant_relationships_are_prevented(self, two_tenants, django_assert_num_queries):
         """FK para entidades de outro tenant deve falhar na validação."""
-        tenant1 = TenantFactory(subdomain="t1")
-        tenant2 = TenantFactory(subdomain="t2")
-
-        set_current_tenant(tenant1)
-        customer_t1 = CustomerFactory(tenant=tenant1)
+        tenant1, tenant2 = two_tenants
 
-        set_current_tenant(tenant2)
-        # Tentar criar pet de tenant2 com customer de tenant1 deve falhar na validação
-        # (serializer valida customer.tenant == request.tenant)
+        # A validação só lê customer.tenant_id: instância não salva, sem INSERT
+        customer_t1 = Customer(tenant=tenant1, name="Customer T1")
         assert customer_t1.tenant != tenant2
+
+        # Pet de tenant2 com customer de tenant1: serializer valida customer.tenant == request.tenant
+        request = RequestFactory().get("/")
+        request.tenant = tenant2
+        serializer = PetSerializer(context={"request": request})
+
+        with django_assert_num_queries(0):
+            with pytest.raises(ValidationError, match="outro tenant"):
+                serializer.validate_customer(customer_t1)
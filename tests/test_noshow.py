@@ -7,22 +7,20 @@ Transição inválida de outros status retorna 422 INVALID_TRANSITION.
 """
 import pytest
 from datetime import timedelta
+from unittest.mock import patch
 from django.utils import timezone
-from rest_framework.test import APIClient
-from core.context import set_current_tenant
+from core.models import Appointment
 from core.services import AppointmentService, InvalidTransitionError
-from tests.factories import TenantFactory, UserFactory, AppointmentFactory
+from core.views import AppointmentViewSet
+from tests.factories import AppointmentFactory, tenant_request
 
 
 @pytest.mark.django_db
 class TestNoShow:
     """RN08: No-show transition rules."""
 
-    def test_confirmed_to_noshow_is_valid(self):
+    def test_confirmed_to_noshow_is_valid(self, tenant):
         """CONFIRMED → NO_SHOW é transição válida."""
-        tenant = TenantFactory(subdomain="noshow1")
-        set_current_tenant(tenant)
-        
         apt = AppointmentFactory(tenant=tenant, status="CONFIRMED")
         
         AppointmentService.transition(apt, "NO_SHOW")
@@ -30,11 +28,8 @@ class TestNoShow:
         apt.refresh_from_db()
         assert apt.status == "NO_SHOW"
 
-    def test_prebooked_to_noshow_is_invalid(self):
+    def test_prebooked_to_noshow_is_invalid(self, tenant):
         """PRE_BOOKED → NO_SHOW é transição inválida."""
-        tenant = TenantFactory(subdomain="noshow2")
-        set_current_tenant(tenant)
-        
         apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
         
         with pytest.raises(InvalidTransitionError):
@@ -43,22 +38,54 @@ class TestNoShow:
         apt.refresh_from_db()
         assert apt.status == "PRE_BOOKED"  # Não mudou
 
-    def test_noshow_via_api_returns_200(self):
-        """PATCH /appointments/{id}/ com status=NO_SHOW retorna 200."""
-        tenant = TenantFactory(subdomain="noshow3")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
+    def test_noshow_on_stale_instance_does_not_overwrite(self, tenant):
+        """Instância lida como CONFIRMED mas já COMPLETED no banco: UPDATE condicional não casa."""
+        apt = AppointmentFactory(tenant=tenant, status="CONFIRMED")
+        Appointment.all_objects.filter(pk=apt.pk).update(status="COMPLETED")
+        
+        with pytest.raises(InvalidTransitionError) as exc_info:
+            AppointmentService.transition(apt, "NO_SHOW")
         
+        assert exc_info.value.current_status == "COMPLETED"
+        apt.refresh_from_db()
+        assert apt.status == "COMPLETED"
+
+    def test_noshow_on_deleted_appointment_raises_does_not_exist(self, tenant):
+        """Appointment removido entre a leitura e o UPDATE: DoesNotExist, não transição inválida."""
         apt = AppointmentFactory(tenant=tenant, status="CONFIRMED")
+        Appointment.all_objects.filter(pk=apt.pk).delete()
         
-        client = APIClient()
-        client.force_authenticate(user=user)
+        with pytest.raises(Appointment.DoesNotExist):
+            AppointmentService.transition(apt, "NO_SHOW")
+
+    def test_noshow_via_api_on_deleted_appointment_returns_404(self, tenant, owner_client):
+        """PATCH com o appointment removido entre get_object() e o UPDATE retorna 404."""
+        apt = AppointmentFactory(tenant=tenant, status="CONFIRMED")
+        get_object = AppointmentViewSet.get_object
+
+        def get_object_then_delete(view):
+            obj = get_object(view)
+            Appointment.all_objects.filter(pk=obj.pk).delete()
+            return obj
+
+        with patch.object(AppointmentViewSet, "get_object", get_object_then_delete):
+            response = owner_client.patch(
+                f"/api/appointments/{apt.id}/",
+                {"status": "NO_SHOW"},
+                format="json",
+            )
+        
+        assert response.status_code == 404
+        assert "não encontrado" in response.data["error"]["message"]
+
+    def test_noshow_via_api_returns_200(self, tenant, owner_client):
+        """PATCH /appointments/{id}/ com status=NO_SHOW retorna 200."""
+        apt = AppointmentFactory(tenant=tenant, status="CONFIRMED")
         
-        response = client.patch(
+        response = owner_client.patch(
             f"/api/appointments/{apt.id}/",
             {"status": "NO_SHOW"},
             format="json",
-            HTTP_HOST="noshow3.localhost:8000",
         )
         
         assert response.status_code == 200
@@ -66,34 +93,22 @@ class TestNoShow:
         apt.refresh_from_db()
         assert apt.status == "NO_SHOW"
 
-    def test_prebooked_to_noshow_via_api_returns_422(self):
-        """PATCH PRE_BOOKED→NO_SHOW via API retorna 422 INVALID_TRANSITION."""
-        tenant = TenantFactory(subdomain="noshow4")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
+    def test_prebooked_to_noshow_via_api_returns_422(self, tenant, shared_owner):
+        """PATCH PRE_BOOKED→NO_SHOW retorna 422 INVALID_TRANSITION (view chamada direto)."""
         apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.patch(
-            f"/api/appointments/{apt.id}/",
-            {"status": "NO_SHOW"},
-            format="json",
-            HTTP_HOST="noshow4.localhost:8000",
+        request = tenant_request(
+            "patch", f"/api/appointments/{apt.id}/", shared_owner, tenant, {"status": "NO_SHOW"}
         )
+        response = AppointmentViewSet.as_view({"patch": "partial_update"})(request, pk=apt.id)
         
         assert response.status_code == 422
         assert response.data["error"]["code"] == "INVALID_TRANSITION"
         assert "PRE_BOOKED" in response.data["error"]["message"]
         assert "NO_SHOW" in response.data["error"]["message"]
 
-    def test_noshow_is_terminal_state(self):
+    def test_noshow_is_terminal_state(self, tenant):
         """NO_SHOW → qualquer outro status é inválido."""
-        tenant = TenantFactory(subdomain="noshow5")
-        set_current_tenant(tenant)
-        
         apt = AppointmentFactory(tenant=tenant, status="NO_SHOW")
         
         with pytest.raises(InvalidTransitionError):
@@ -104,9 +119,6 @@ class TestNoShow:
 
     def test_confirmed_has_multiple_valid_transitions_including_noshow(self):
         """CONFIRMED tem múltiplas transições válidas: COMPLETED, NO_SHOW, CANCELLED."""
-        tenant = TenantFactory(subdomain="noshow6")
-        set_current_tenant(tenant)
-        
         allowed = AppointmentService.get_allowed_transitions("CONFIRMED")
         
         assert "COMPLETED" in allowed
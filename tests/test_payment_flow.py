@@ -12,23 +12,17 @@ from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from rest_framework.test import APIClient
-from core.context import set_current_tenant
 from core.models import Payment, Appointment
-from tests.factories import TenantFactory, UserFactory, AppointmentFactory
+from core.mp_client import PooledHttpClient, build_session, get_mp_sdk
+from tests.factories import AppointmentFactory, make_apt_with_payment
 
 
 @pytest.mark.django_db
 class TestPaymentFlow:
     """RN06: Mercado Pago payment flow."""
 
-    @responses.activate
-    def test_checkout_creates_payment_and_returns_link(self):
-        """POST /payments/checkout/ cria Payment e retorna payment_link."""
-        tenant = TenantFactory(subdomain="pay1")
-        user = UserFactory(tenant=tenant)
-        set_current_tenant(tenant)
-        
+    def test_checkout_creates_payment_and_returns_link(self, mp_mock, tenant, owner_client):
+        """POST /payments/checkout/ cria Payment (202) e a task grava o payment_link."""
         apt = AppointmentFactory(
             tenant=tenant,
             status="PRE_BOOKED",
@@ -38,7 +32,7 @@ class TestPaymentFlow:
         
         # Mock Mercado Pago preference creation
         # SDK usa endpoint POST /checkout/preferences
-        responses.add(
+        mp_mock.add(
             responses.POST,
             "https://api.mercadopago.com/checkout/preferences",
             json={
@@ -48,51 +42,45 @@ class TestPaymentFlow:
             status=201,
         )
         
-        client = APIClient()
-        client.force_authenticate(user=user)
-        
-        response = client.post(
+        response = owner_client.post(
             "/api/payments/checkout/",
             {"appointment_id": apt.id},
             format="json",
-            HTTP_HOST="pay1.localhost:8000",
         )
         
-        assert response.status_code == 201
-        assert "payment_link" in response.data
+        assert response.status_code == 202
         
         # Verificar Payment criado
         payment = Payment.all_objects.get(appointment=apt)
+        assert response.data["payment_id"] == payment.id
         assert payment.amount == Decimal("50.00")  # 50% de 100
         assert payment.status == "PENDING"
         assert payment.payment_id_external == "MP123456"
+        
+        # Link disponível via polling em GET /payments/{id}/
+        detail = owner_client.get(f"/api/payments/{payment.id}/")
+        assert detail.status_code == 200
+        assert "MP123456" in detail.data["payment_link"]
 
-    @responses.activate
-    def test_webhook_approved_confirms_appointment(self):
+    def test_webhook_approved_confirms_appointment(self, mp_mock, api_client, tenant):
         """Webhook com status=approved confirma appointment."""
-        tenant = TenantFactory(subdomain="webhook1")
-        set_current_tenant(tenant)
         
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="PENDING",
-            payment_id_external="MP999",
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external="MP999",
         )
+        payment = apt.payment
         
         # Mock Mercado Pago get payment
         # SDK usa endpoint GET /v1/payments/{id}
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MP999",
             json={"status": "approved"},
             status=200,
         )
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MP999"}},
             format="json",
@@ -107,31 +95,24 @@ class TestPaymentFlow:
         assert payment.webhook_processed is True
         assert apt.status == "CONFIRMED"
 
-    @responses.activate
-    def test_webhook_rejected_keeps_prebooked(self):
+    def test_webhook_rejected_keeps_prebooked(self, mp_mock, api_client, tenant):
         """Webhook com status=rejected mantém appointment PRE_BOOKED."""
-        tenant = TenantFactory(subdomain="webhook2")
-        set_current_tenant(tenant)
         
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="PENDING",
-            payment_id_external="MP888",
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external="MP888",
         )
+        payment = apt.payment
         
         # Mock Mercado Pago get payment
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MP888",
             json={"status": "rejected"},
             status=200,
         )
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MP888"}},
             format="json",
@@ -146,33 +127,25 @@ class TestPaymentFlow:
         assert payment.webhook_processed is True
         assert apt.status == "PRE_BOOKED"  # Não mudou
 
-    @responses.activate
-    def test_webhook_idempotency_processes_once(self):
+    def test_webhook_idempotency_processes_once(self, mp_mock, api_client, tenant):
         """Webhook duplicado é processado apenas uma vez."""
-        tenant = TenantFactory(subdomain="webhook3")
-        set_current_tenant(tenant)
         
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="PENDING",
-            payment_id_external="MP777",
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external="MP777",
         )
+        payment = apt.payment
         
         # Mock Mercado Pago get payment
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MP777",
             json={"status": "approved"},
             status=200,
         )
         
-        client = APIClient()
-        
         # Primeiro webhook
-        r1 = client.post(
+        r1 = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MP777"}},
             format="json",
@@ -180,23 +153,22 @@ class TestPaymentFlow:
         assert r1.status_code == 200
         
         # Segundo webhook (duplicado)
-        r2 = client.post(
+        r2 = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MP777"}},
             format="json",
         )
         assert r2.status_code == 200
-        assert "already_processed" in r2.data["status"]
+        assert "already_processed" in r2.json()["status"]
         
         # Verificar que status não foi alterado múltiplas vezes
         payment.refresh_from_db()
         assert payment.webhook_processed is True
         assert payment.status == "APPROVED"
 
-    def test_payment_not_found_returns_404(self):
+    def test_payment_not_found_returns_404(self, api_client):
         """Webhook com payment_id inexistente retorna 404."""
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "NONEXISTENT"}},
             format="json",
@@ -205,14 +177,61 @@ class TestPaymentFlow:
         assert response.status_code == 404
         assert response.data["error"]["code"] == "PAYMENT_NOT_FOUND"
 
-    def test_non_payment_notification_is_ignored(self):
+    def test_non_payment_notification_is_ignored(self, api_client):
         """Webhook type != payment é ignorado."""
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "subscription", "data": {"id": "SUB123"}},
             format="json",
         )
         
         assert response.status_code == 200
-        assert response.data["status"] == "ignored"
+        assert response.json()["status"] == "ignored"
+
+    def test_non_payment_query_type_skips_body_parsing(self, api_client):
+        """Type != payment na query string é ignorado sem parsear o body."""
+        response = api_client.post(
+            "/api/webhooks/mercadopago/?type=merchant_order",
+            data="{not json",
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "ignored"
+
+
+class TestPooledMercadoPagoClient:
+    """SDK real do Mercado Pago passando pelo PooledHttpClient (HTTP mockado com responses)."""
+
+    def test_preference_create_goes_through_pooled_session(self, mp_mock):
+        """sdk.preference().create usa a Session compartilhada e devolve status/response do MP."""
+        mp_mock.add(
+            responses.POST,
+            "https://api.mercadopago.com/checkout/preferences",
+            json={"id": "PREF-POOL", "init_point": "https://mp.test/PREF-POOL"},
+            status=201,
+        )
+
+        result = get_mp_sdk().preference().create(
+            {"items": [{"title": "Banho - Rex", "quantity": 1, "unit_price": 50.0}]}
+        )
+
+        assert result == {
+            "status": 201,
+            "response": {"id": "PREF-POOL", "init_point": "https://mp.test/PREF-POOL"},
+        }
+        assert len(mp_mock.calls) == 1
+
+    def test_request_accepts_sdk_retry_options(self, mp_mock):
+        """Opções de retry do SDK 3.x (retry_on/backoff_factor) não chegam à requests.Session."""
+        mp_mock.add(responses.GET, "https://api.mercadopago.com/v1/payments/MPPOOL", status=204)
+
+        result = PooledHttpClient(build_session()).request(
+            "GET",
+            "https://api.mercadopago.com/v1/payments/MPPOOL",
+            maxretries=3,
+            retry_on=[500],
+            backoff_factor=0.5,
+        )
+
+        assert result == {"status": 204, "response": None}
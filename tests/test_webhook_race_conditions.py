@@ -2,23 +2,22 @@
 Testes de race conditions em webhooks e edge cases de permissions.
 Cobre cenários de concorrência, processamento duplicado e validações de permissões.
 """
+import json
+
 import pytest
 import responses
 from decimal import Decimal
 from datetime import timedelta
 from django.utils import timezone
 from django.test import RequestFactory
-from rest_framework.test import APIClient
-from unittest.mock import patch, MagicMock
-from core.context import set_current_tenant
 from core.models import Payment, Appointment
 from core.serializers import PetSerializer
+from core.services import PaymentService
 from tests.factories import (
-    TenantFactory,
     UserFactory,
     CustomerFactory,
     PetFactory,
-    AppointmentFactory,
+    make_apt_with_payment,
 )
 
 
@@ -55,11 +54,8 @@ class TestPermissionsLines:
         result = permission.has_permission(request, None)
         assert result is False
 
-    def test_permission_with_user_with_wrong_role(self):
+    def test_permission_with_user_with_wrong_role(self, tenant):
         """Testa permission quando user tem role diferente."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
-        
         # Criar user com role ATTENDANT (não OWNER)
         user = UserFactory(tenant=tenant, role="ATTENDANT")
         
@@ -80,10 +76,8 @@ class TestPermissionsLines:
 class TestSerializersLine91:
     """Cobertura de serializers.py linha 91 - return value no validate_customer."""
 
-    def test_pet_serializer_validate_customer_returns_value_when_valid(self):
+    def test_pet_serializer_validate_customer_returns_value_when_valid(self, tenant):
         """Testa validate_customer retornando value quando válido."""
-        tenant = TenantFactory()
-        set_current_tenant(tenant)
         customer = CustomerFactory(tenant=tenant)
         
         factory = RequestFactory()
@@ -103,135 +97,106 @@ class TestSerializersLine91:
 class TestWebhookRaceConditionPaths:
     """Cobertura de views.py linhas 367-371, 400-404 - race condition paths."""
 
-    @responses.activate
-    def test_webhook_approved_race_condition_mock(self):
-        """Simula race condition onde payment é processado entre checks."""
-        tenant = TenantFactory(subdomain="race1")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="PENDING",
-            payment_id_external="MPRACE1",
-            webhook_processed=False,
+    @pytest.mark.parametrize(
+        "mp_status,final_status,external_id",
+        [
+            pytest.param("approved", "APPROVED", "MPRACE1", id="approved"),
+            pytest.param("rejected", "REJECTED", "MPRACE2", id="rejected"),
+        ],
+    )
+    def test_webhook_race_condition_mock(
+        self, mp_mock, api_client, tenant, mp_status, final_status, external_id
+    ):
+        """Simula race condition onde payment é processado entre checks (approved/rejected)."""
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external=external_id,
         )
+        payment = apt.payment
         
-        # Mock MP API
-        responses.add(
+        # Outra thread processa o payment enquanto a task espera o MP
+        def mp_callback(request):
+            Payment.all_objects.filter(pk=payment.pk).update(
+                status=final_status, webhook_processed=True
+            )
+            return (200, {}, json.dumps({"status": mp_status}))
+
+        mp_mock.add_callback(
             responses.GET,
-            "https://api.mercadopago.com/v1/payments/MPRACE1",
-            json={"status": "approved"},
-            status=200,
+            f"https://api.mercadopago.com/v1/payments/{external_id}",
+            callback=mp_callback,
+            content_type="application/json",
+        )
+
+        response = api_client.post(
+            "/api/webhooks/mercadopago/",
+            {"type": "payment", "data": {"id": external_id}},
+            format="json",
+            HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
         )
         
-        # Mock select_for_update para retornar payment já processado
-        original_select_for_update = Payment.all_objects.select_for_update
-        
-        def mock_select_for_update(*args, **kwargs):
-            # Quando select_for_update é chamado, marcar payment como processado
-            # simulando que outra thread o processou
-            payment.webhook_processed = True
-            payment.status = "APPROVED"
-            payment.save()
-            return original_select_for_update(*args, **kwargs)
-        
-        with patch.object(
-            Payment.all_objects.__class__,
-            'select_for_update',
-            side_effect=mock_select_for_update
-        ):
-            client = APIClient()
-            response = client.post(
-                "/api/webhooks/mercadopago/",
-                {"type": "payment", "data": {"id": "MPRACE1"}},
-                format="json",
-                HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
-            )
-        
-        # Deve retornar already_processed (linhas 367-371)
+        # UPDATE condicional não casa: mantém o estado da outra thread e
+        # o appointment não é confirmado de novo
         assert response.status_code == 200
-        assert response.data.get("status") in ["already_processed", "ok"]
+        payment.refresh_from_db()
+        apt.refresh_from_db()
+        assert payment.status == final_status
+        assert payment.webhook_processed is True
+        assert apt.status == "PRE_BOOKED"
+        assert len(mp_mock.calls) == 1
 
-    @responses.activate
-    def test_webhook_rejected_race_condition_mock(self):
-        """Simula race condition para status rejected."""
-        tenant = TenantFactory(subdomain="race2")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="PENDING",
-            payment_id_external="MPRACE2",
-            webhook_processed=False,
+    def test_webhook_claimed_payment_skips_mp_call(self, mp_mock, tenant):
+        """Payment reivindicado por outro worker: a task não consulta o MP."""
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external="MPCLAIM1",
         )
-        
-        # Mock MP API
-        responses.add(
+        Payment.all_objects.filter(pk=apt.payment.pk).update(webhook_claimed_at=timezone.now())
+
+        result = PaymentService.process_notification(apt.payment.pk, "MPCLAIM1")
+
+        assert result == "already_processed"
+        assert len(mp_mock.calls) == 0
+
+    def test_webhook_expired_claim_is_taken_over(self, mp_mock, tenant):
+        """Claim expirado (worker morreu no meio da chamada) é assumido e liberado ao final."""
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external="MPCLAIM2",
+        )
+        stale = timezone.now() - PaymentService.WEBHOOK_CLAIM_TTL - timedelta(seconds=1)
+        Payment.all_objects.filter(pk=apt.payment.pk).update(webhook_claimed_at=stale)
+        mp_mock.add(
             responses.GET,
-            "https://api.mercadopago.com/v1/payments/MPRACE2",
-            json={"status": "rejected"},
+            "https://api.mercadopago.com/v1/payments/MPCLAIM2",
+            json={"status": "approved"},
             status=200,
         )
-        
-        # Mock select_for_update para retornar payment já processado
-        original_select_for_update = Payment.all_objects.select_for_update
-        
-        def mock_select_for_update(*args, **kwargs):
-            # Simular que outra thread processou
-            payment.webhook_processed = True
-            payment.status = "REJECTED"
-            payment.save()
-            return original_select_for_update(*args, **kwargs)
-        
-        with patch.object(
-            Payment.all_objects.__class__,
-            'select_for_update',
-            side_effect=mock_select_for_update
-        ):
-            client = APIClient()
-            response = client.post(
-                "/api/webhooks/mercadopago/",
-                {"type": "payment", "data": {"id": "MPRACE2"}},
-                format="json",
-                HTTP_HOST=f"{tenant.subdomain}.localhost:8000",
-            )
-        
-        # Deve retornar already_processed (linhas 400-404)
-        assert response.status_code == 200
-        assert response.data.get("status") in ["already_processed", "ok"]
 
-    @responses.activate  
-    def test_webhook_approved_updates_correctly_when_not_processed(self):
+        result = PaymentService.process_notification(apt.payment.pk, "MPCLAIM2")
+
+        assert result == "processed"
+        payment = Payment.all_objects.get(pk=apt.payment.pk)
+        assert payment.status == "APPROVED"
+        assert payment.webhook_claimed_at is None
+
+    def test_webhook_approved_updates_correctly_when_not_processed(self, mp_mock, api_client, tenant):
         """Testa que webhook approved processa corretamente quando não foi processado antes."""
-        tenant = TenantFactory(subdomain="wap1")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="PENDING",
-            payment_id_external="MPWAP1",
-            webhook_processed=False,  # NÃO processado
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external="MPWAP1",
         )
+        payment = apt.payment
         
         # Mock MP API
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MPWAP1",
             json={"status": "approved"},
             status=200,
         )
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MPWAP1"}},
             format="json",
@@ -240,39 +205,30 @@ class TestWebhookRaceConditionPaths:
         
         # Deve processar com sucesso
         assert response.status_code == 200
-        assert response.data["status"] == "processed"
+        assert response.json()["status"] == "queued"
         
         # Verificar que payment foi atualizado
         payment.refresh_from_db()
         assert payment.status == "APPROVED"
         assert payment.webhook_processed is True
 
-    @responses.activate
-    def test_webhook_rejected_updates_correctly_when_not_processed(self):
+    def test_webhook_rejected_updates_correctly_when_not_processed(self, mp_mock, api_client, tenant):
         """Testa que webhook rejected processa corretamente quando não foi processado antes."""
-        tenant = TenantFactory(subdomain="wrej1")
-        set_current_tenant(tenant)
-        
-        apt = AppointmentFactory(tenant=tenant, status="PRE_BOOKED")
-        payment = Payment.all_objects.create(
-            tenant=tenant,
-            appointment=apt,
-            amount=Decimal("50.00"),
-            status="PENDING",
-            payment_id_external="MPWREJ1",
-            webhook_processed=False,  # NÃO processado
+        apt = make_apt_with_payment(
+            tenant, timedelta(days=1), Decimal("50.00"),
+            payment_status="PENDING", status="PRE_BOOKED", payment_id_external="MPWREJ1",
         )
+        payment = apt.payment
         
         # Mock MP API
-        responses.add(
+        mp_mock.add(
             responses.GET,
             "https://api.mercadopago.com/v1/payments/MPWREJ1",
             json={"status": "rejected"},
             status=200,
         )
         
-        client = APIClient()
-        response = client.post(
+        response = api_client.post(
             "/api/webhooks/mercadopago/",
             {"type": "payment", "data": {"id": "MPWREJ1"}},
             format="json",
@@ -281,7 +237,7 @@ class TestWebhookRaceConditionPaths:
         
         # Deve processar com sucesso
         assert response.status_code == 200
-        assert response.data["status"] == "processed"
+        assert response.json()["status"] == "queued"
         
         # Verificar que payment foi atualizado
         payment.refresh_from_db()